@@ -2,7 +2,6 @@
 import audioread
 import base64
 import gui_data.sv_ttk
-import hashlib
 import json
 import librosa
 import logging
@@ -11,7 +10,6 @@ import natsort
 import onnx
 import os
 import pickle  # Save Data
-import psutil
 from pyglet import font
 import pyperclip
 import base64
@@ -46,8 +44,9 @@ from gui_data.tkinterdnd2 import TkinterDnD, DND_FILES
 from lib_v5.vr_network.model_param_init import ModelParameters
 from kthread import KThread
 from lib_v5 import spec_utils
+from lib_v5.model_hash import get_model_hash
 from pathlib  import Path
-from separate import SeperateDemucs, SeperateMDX, SeperateVR, save_format
+from separate import SeperateDemucs, SeperateMDX, SeperateVR, save_format, onnx_session_pool, demucs_model_pool, vr_band_cache
 from playsound import playsound
 from tkinter import *
 from tkinter.tix import *
@@ -162,9 +161,11 @@ DEMUCS_NEWER_REPO_DIR = os.path.join(DEMUCS_MODELS_DIR, 'v3_v4_repo')
 
 #Cache & Parameters
 VR_HASH_DIR = os.path.join(VR_MODELS_DIR, 'model_data')
+DEMUCS_HASH_DIR = os.path.join(DEMUCS_MODELS_DIR, 'model_data')
 VR_HASH_JSON = os.path.join(VR_MODELS_DIR, 'model_data', 'model_data.json')
 MDX_HASH_DIR = os.path.join(MDX_MODELS_DIR, 'model_data')
 MDX_HASH_JSON = os.path.join(MDX_MODELS_DIR, 'model_data', 'model_data.json')
+MDX_CONVERTED_DIR = os.path.join(MDX_MODELS_DIR, 'converted')
 ENSEMBLE_CACHE_DIR = os.path.join(BASE_PATH, 'gui_data', 'saved_ensembles')
 SETTINGS_CACHE_DIR = os.path.join(BASE_PATH, 'gui_data', 'saved_settings')
 VR_PARAM_DIR = os.path.join(BASE_PATH, 'lib_v5', 'vr_network', 'modelparams')
@@ -241,6 +242,7 @@ class ModelData():
 
         self.is_gpu_conversion = 0 if root.is_gpu_conversion_var.get() else -1
         self.is_normalization = root.is_normalization_var.get()
+        self.auto_memory_budget = int(root.auto_memory_budget_var.get().rstrip('%'))/100
         self.is_primary_stem_only = root.is_primary_stem_only_var.get()
         self.is_secondary_stem_only = root.is_secondary_stem_only_var.get()
         self.is_denoise = root.is_denoise_var.get()
@@ -271,6 +273,8 @@ class ModelData():
         self.is_pre_proc_model = is_pre_proc_model
         self.is_dry_check = is_dry_check
         self.model_samplerate = 44100
+        self.model_hash = None
+        self.autotune_cache_dir = None
         self.is_demucs_pre_proc_model_inst_mix = False
         self.manual_download_Button = None
         self.secondary_model_4_stem = []
@@ -301,10 +305,12 @@ class ModelData():
             self.is_tta = root.is_tta_var.get()
             self.is_post_process = root.is_post_process_var.get()
             self.window_size = int(root.window_size_var.get())
-            self.batch_size = int(root.batch_size_var.get())
+            self.batch_size = root.batch_size_var.get() if root.batch_size_var.get() == AUTO_SELECT else int(root.batch_size_var.get())
             self.crop_size = int(root.crop_size_var.get())
             self.is_high_end_process = 'mirroring' if root.is_high_end_process_var.get() else 'None'
             self.post_process_threshold = float(root.post_process_threshold_var.get())
+            self.is_vr_streaming = root.is_vr_streaming_var.get()
+            self.autotune_cache_dir = VR_HASH_DIR
             self.model_path = os.path.join(VR_MODELS_DIR, f"{self.model_name}.pth")
             self.get_model_hash()
             if self.model_hash:
@@ -321,7 +327,13 @@ class ModelData():
         if self.process_method == MDX_ARCH_TYPE:
             self.is_secondary_model_activated = root.mdx_is_secondary_model_activate_var.get() if not is_secondary_model else False
             self.margin = int(root.margin_var.get())
-            self.chunks = root.determine_auto_chunks(root.chunks_var.get(), self.is_gpu_conversion)
+            self.chunks = root.determine_auto_chunks(root.chunks_var.get())
+            self.mdx_batch_size = int(root.mdx_batch_size_var.get())
+            self.mdx_session_profile = root.mdx_session_profile_var.get()
+            self.mdx_model_cache_dir = MDX_HASH_DIR
+            self.autotune_cache_dir = MDX_HASH_DIR
+            self.mdx_precision = root.mdx_precision_var.get()
+            self.is_mdx_streaming = root.is_mdx_streaming_var.get()
             self.get_mdx_model_path()
             self.get_model_hash()
             if self.model_hash:
@@ -342,12 +354,20 @@ class ModelData():
                 self.pre_proc_model_activated = root.is_demucs_pre_proc_model_activate_var.get() if not root.demucs_stems_var.get() in [VOCAL_STEM, INST_STEM] else False
             self.overlap = float(root.overlap_var.get())
             self.margin_demucs = int(root.margin_demucs_var.get())
-            self.chunks_demucs = root.determine_auto_chunks(root.chunks_demucs_var.get(), self.is_gpu_conversion)
+            self.chunks_demucs = root.determine_auto_chunks(root.chunks_demucs_var.get())
             self.shifts = int(root.shifts_var.get())
             self.is_split_mode = root.is_split_mode_var.get()
             self.segment = root.segment_var.get()
+            self.segment_batch = root.segment_batch_var.get()
+            self.demucs_cpu_workers = root.demucs_cpu_workers_var.get()
+            self.demucs_cpu_threads = root.demucs_cpu_threads_var.get()
+            self.demucs_attention = root.demucs_attention_var.get()
+            self.demucs_backend = root.demucs_backend_var.get()
             self.is_chunk_demucs = root.is_chunk_demucs_var.get()
+            self.autotune_cache_dir = DEMUCS_HASH_DIR
             self.is_demucs_combine_stems = root.is_demucs_combine_stems_var.get()
+            self.is_demucs_batch_shifts = root.is_demucs_batch_shifts_var.get()
+            self.is_demucs_concurrent_models = root.is_demucs_concurrent_models_var.get()
             self.is_primary_stem_only = root.is_primary_stem_only_var.get() if self.is_ensemble_mode else root.is_primary_stem_only_Demucs_var.get() 
             self.is_secondary_stem_only = root.is_secondary_stem_only_var.get() if self.is_ensemble_mode else root.is_secondary_stem_only_Demucs_var.get()
             self.get_demucs_model_path()
@@ -399,6 +419,12 @@ class ModelData():
         else:
             self.model_path = os.path.join(MDX_MODELS_DIR, f"{self.model_name}.onnx")
             
+        if self.mdx_precision != MDX_PRECISION_FP32:
+            model_name = os.path.splitext(os.path.basename(self.model_path))[0]
+            converted_model_path = os.path.join(MDX_CONVERTED_DIR, f"{model_name}_{self.mdx_precision.lower()}.onnx")
+            if os.path.isfile(converted_model_path):
+                self.model_path = converted_model_path
+            
         self.mixer_path = os.path.join(MDX_MODELS_DIR, f"mixer_val.ckpt")
     
     def get_demucs_model_path(self):
@@ -475,9 +501,7 @@ class ModelData():
                         break
                     
             if not self.model_hash:
-                with open(self.model_path, 'rb') as f:
-                    f.seek(- 10000 * 1024, 2)
-                    self.model_hash = hashlib.md5(f.read()).hexdigest()
+                self.model_hash = get_model_hash(self.model_path)
                 
                 table_entry = {self.model_path: self.model_hash}
                 model_hash_table.update(table_entry)
@@ -1477,33 +1501,13 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
 
         return tuple(os.path.splitext(x)[0] for x in os.listdir(directory) if x.endswith(ext))
         
-    def determine_auto_chunks(self, chunks, gpu):
-        """Determines appropriate chunk size based on user computer specs"""
-        
-        if OPERATING_SYSTEM == 'Darwin':
-            gpu = -1
+    def determine_auto_chunks(self, chunks):
+        """Determines the chunk size. "Auto" is passed through and measured against the loaded model at separation time"""
 
         if chunks == 'Full':
             chunk_set = 0
         elif chunks == 'Auto':
-            if gpu == 0:
-                gpu_mem = round(torch.cuda.get_device_properties(0).total_memory/1.074e+9)
-                if gpu_mem <= int(6):
-                    chunk_set = int(5)
-                if gpu_mem in [7, 8, 9, 10, 11, 12, 13, 14, 15]:
-                    chunk_set = int(10)
-                if gpu_mem >= int(16):
-                    chunk_set = int(40)
-            if gpu == -1:
-                sys_mem = psutil.virtual_memory().total >> 30
-                if sys_mem <= int(4):
-                    chunk_set = int(1)
-                if sys_mem in [5, 6, 7, 8]:
-                    chunk_set = int(10)
-                if sys_mem in [9, 10, 11, 12, 13, 14, 15, 16]:
-                    chunk_set = int(25)
-                if sys_mem >= int(17):
-                    chunk_set = int(60) 
+            chunk_set = AUTO_SELECT
         elif chunks == '0':
             chunk_set = 0
         else:
@@ -2222,22 +2226,28 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         is_normalization_Option.grid(row=12,column=0,padx=0,pady=0)
         self.help_hints(is_normalization_Option, text=IS_NORMALIZATION_HELP)
         
+        auto_memory_budget_Label = self.menu_sub_LABEL_SET(settings_menu_format_Frame, 'Auto Memory Budget')
+        auto_memory_budget_Label.grid(row=13,column=0,padx=0,pady=5)
+        auto_memory_budget_Option = ttk.OptionMenu(settings_menu_format_Frame, self.auto_memory_budget_var, None, *AUTO_MEMORY_BUDGETS)
+        auto_memory_budget_Option.grid(row=14,column=0,padx=20,pady=5)
+        self.help_hints(auto_memory_budget_Label, text=AUTO_MEMORY_BUDGET_HELP)
+        
         model_sample_mode_Label = self.menu_title_LABEL_SET(settings_menu_format_Frame, "Model Sample Mode Settings")
-        model_sample_mode_Label.grid(row=13,column=0,padx=0,pady=10)
+        model_sample_mode_Label.grid(row=15,column=0,padx=0,pady=10)
         
         self.model_sample_mode_duration_Label = self.menu_sub_LABEL_SET(settings_menu_format_Frame, 'Sample Clip Duration')
-        self.model_sample_mode_duration_Label.grid(row=14,column=0,padx=0,pady=5)
+        self.model_sample_mode_duration_Label.grid(row=16,column=0,padx=0,pady=5)
         
-        tk.Label(settings_menu_format_Frame, textvariable=model_sample_mode_duration_label_var, font=(MAIN_FONT_NAME, f"{FONT_SIZE_1}"), foreground='#13849f').grid(row=15,column=0,padx=0,pady=2)
+        tk.Label(settings_menu_format_Frame, textvariable=model_sample_mode_duration_label_var, font=(MAIN_FONT_NAME, f"{FONT_SIZE_1}"), foreground='#13849f').grid(row=17,column=0,padx=0,pady=2)
         model_sample_mode_duration_Option = ttk.Scale(settings_menu_format_Frame, variable=self.model_sample_mode_duration_var, from_=5, to=120, command=set_vars_for_sample_mode, orient='horizontal')
-        model_sample_mode_duration_Option.grid(row=16,column=0,padx=0,pady=2)
+        model_sample_mode_duration_Option.grid(row=18,column=0,padx=0,pady=2)
         
         delete_your_settings_Label = self.menu_title_LABEL_SET(settings_menu_format_Frame, "Delete User Saved Setting")
-        delete_your_settings_Label.grid(row=17,column=0,padx=0,pady=10)
+        delete_your_settings_Label.grid(row=19,column=0,padx=0,pady=10)
         self.help_hints(delete_your_settings_Label, text=DELETE_YOUR_SETTINGS_HELP)
         
         delete_your_settings_Option = ttk.OptionMenu(settings_menu_format_Frame, option_var)
-        delete_your_settings_Option.grid(row=18,column=0,padx=20,pady=5)
+        delete_your_settings_Option.grid(row=20,column=0,padx=20,pady=5)
         self.deletion_list_fill(delete_your_settings_Option, option_var, self.last_found_settings, SETTINGS_CACHE_DIR, SELECT_SAVED_SETTING)
         
         #Settings Tab 3
@@ -2371,11 +2381,11 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         
         self.batch_size_Label = self.menu_sub_LABEL_SET(vr_opt_frame, 'Batch Size')
         self.batch_size_Label.grid(row=8,column=0,padx=0,pady=5)
-        self.batch_size_sub_Label = self.menu_sub_LABEL_SET(vr_opt_frame, '(Works with select models only)', font_size=FONT_SIZE_1)
+        self.batch_size_sub_Label = self.menu_sub_LABEL_SET(vr_opt_frame, '(Higher values use more memory)', font_size=FONT_SIZE_1)
         self.batch_size_sub_Label.grid(row=9,column=0,padx=0,pady=0)
         self.batch_size_Option = ttk.Combobox(vr_opt_frame, value=VR_BATCH, width=MENU_COMBOBOX_WIDTH, textvariable=self.batch_size_var)
         self.batch_size_Option.grid(row=10,column=0,padx=0,pady=5)
-        self.combobox_entry_validation(self.batch_size_Option, self.batch_size_var, REG_WINDOW, VR_BATCH)
+        self.combobox_entry_validation(self.batch_size_Option, self.batch_size_var, REG_BATCHES, VR_BATCH)
         self.help_hints(self.batch_size_Label, text=BATCH_SIZE_HELP)
         
         self.post_process_threshold_Label = self.menu_sub_LABEL_SET(vr_opt_frame, 'Post-process Threshold')
@@ -2397,18 +2407,22 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.is_high_end_process_Option.grid(row=15,column=0,padx=0,pady=0)
         self.help_hints(self.is_high_end_process_Option, text=IS_HIGH_END_PROCESS_HELP)
         
+        self.is_vr_streaming_Option = ttk.Checkbutton(vr_opt_frame, text='Streaming Mode', width=VR_CHECKBOXS_WIDTH, variable=self.is_vr_streaming_var) 
+        self.is_vr_streaming_Option.grid(row=16,column=0,padx=0,pady=0)
+        self.help_hints(self.is_vr_streaming_Option, text=IS_VR_STREAMING_HELP)
+        
         self.vr_clear_cache_Button = ttk.Button(vr_opt_frame, text='Clear Auto-Set Cache', command=lambda:self.clear_cache(VR_ARCH_TYPE))
-        self.vr_clear_cache_Button.grid(row=16,column=0,padx=0,pady=5)
+        self.vr_clear_cache_Button.grid(row=17,column=0,padx=0,pady=5)
         self.help_hints(self.vr_clear_cache_Button, text=CLEAR_CACHE_HELP)
         
         self.open_vr_model_dir_Button = ttk.Button(vr_opt_frame, text='Open VR Models Folder', command=lambda:OPEN_FILE_func(VR_MODELS_DIR))
-        self.open_vr_model_dir_Button.grid(row=17,column=0,padx=0,pady=5)
+        self.open_vr_model_dir_Button.grid(row=18,column=0,padx=0,pady=5)
         
         self.vr_return_Button=ttk.Button(vr_opt_frame, text=BACK_TO_MAIN_MENU, command=lambda:(self.menu_advanced_vr_options_close_window(), self.check_is_menu_settings_open()))
-        self.vr_return_Button.grid(row=18,column=0,padx=0,pady=5)
+        self.vr_return_Button.grid(row=19,column=0,padx=0,pady=5)
 
         self.vr_close_Button = ttk.Button(vr_opt_frame, text='Close Window', command=lambda:self.menu_advanced_vr_options_close_window())
-        self.vr_close_Button.grid(row=19,column=0,padx=0,pady=5)
+        self.vr_close_Button.grid(row=20,column=0,padx=0,pady=5)
         
         toggle_post_process()
         
@@ -2464,44 +2478,85 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.combobox_entry_validation(self.overlap_Option, self.overlap_var, REG_OVERLAP, DEMUCS_OVERLAP)
         self.help_hints(self.overlap_Label, text=OVERLAP_HELP)
 
+        self.segment_batch_Label = self.menu_sub_LABEL_SET(demucs_frame, 'Segment Batch')
+        self.segment_batch_Label.grid(row=7,column=0,padx=0,pady=5)
+        self.segment_batch_Option = ttk.Combobox(demucs_frame, value=DEMUCS_SEGMENT_BATCHES, width=MENU_COMBOBOX_WIDTH, textvariable=self.segment_batch_var)
+        self.segment_batch_Option.grid(row=8,column=0,padx=0,pady=5)
+        self.combobox_entry_validation(self.segment_batch_Option, self.segment_batch_var, REG_BATCHES, DEMUCS_SEGMENT_BATCHES)
+        self.help_hints(self.segment_batch_Label, text=SEGMENT_BATCH_HELP)
+
+        self.demucs_cpu_workers_Label = self.menu_sub_LABEL_SET(demucs_frame, 'CPU Workers')
+        self.demucs_cpu_workers_Label.grid(row=9,column=0,padx=0,pady=5)
+        self.demucs_cpu_workers_Option = ttk.Combobox(demucs_frame, value=DEMUCS_CPU_WORKERS, width=MENU_COMBOBOX_WIDTH, textvariable=self.demucs_cpu_workers_var)
+        self.demucs_cpu_workers_Option.grid(row=10,column=0,padx=0,pady=5)
+        self.combobox_entry_validation(self.demucs_cpu_workers_Option, self.demucs_cpu_workers_var, REG_BATCHES, DEMUCS_CPU_WORKERS)
+        self.help_hints(self.demucs_cpu_workers_Label, text=DEMUCS_CPU_WORKERS_HELP)
+
+        self.demucs_cpu_threads_Label = self.menu_sub_LABEL_SET(demucs_frame, 'CPU Threads')
+        self.demucs_cpu_threads_Label.grid(row=11,column=0,padx=0,pady=5)
+        self.demucs_cpu_threads_Option = ttk.Combobox(demucs_frame, value=DEMUCS_CPU_THREADS, width=MENU_COMBOBOX_WIDTH, textvariable=self.demucs_cpu_threads_var)
+        self.demucs_cpu_threads_Option.grid(row=12,column=0,padx=0,pady=5)
+        self.combobox_entry_validation(self.demucs_cpu_threads_Option, self.demucs_cpu_threads_var, REG_BATCHES, DEMUCS_CPU_THREADS)
+        self.help_hints(self.demucs_cpu_threads_Label, text=DEMUCS_CPU_THREADS_HELP)
+
+        self.demucs_attention_Label = self.menu_sub_LABEL_SET(demucs_frame, 'Attention')
+        self.demucs_attention_Label.grid(row=13,column=0,padx=0,pady=5)
+        self.demucs_attention_Option = ttk.OptionMenu(demucs_frame, self.demucs_attention_var, None, AUTO_SELECT, *DEMUCS_ATTENTION_BACKENDS)
+        self.demucs_attention_Option.grid(row=14,column=0,padx=0,pady=5)
+        self.help_hints(self.demucs_attention_Label, text=DEMUCS_ATTENTION_HELP)
+
+        self.demucs_backend_Label = self.menu_sub_LABEL_SET(demucs_frame, 'Backend')
+        self.demucs_backend_Label.grid(row=15,column=0,padx=0,pady=5)
+        self.demucs_backend_Option = ttk.OptionMenu(demucs_frame, self.demucs_backend_var, None, *DEMUCS_BACKENDS)
+        self.demucs_backend_Option.grid(row=16,column=0,padx=0,pady=5)
+        self.help_hints(self.demucs_backend_Label, text=DEMUCS_BACKEND_HELP)
+
         self.chunks_demucs_Label = self.menu_sub_LABEL_SET(demucs_frame, 'Chunks')
-        self.chunks_demucs_Label.grid(row=7,column=0,padx=0,pady=5)
+        self.chunks_demucs_Label.grid(row=17,column=0,padx=0,pady=5)
         self.chunks_demucs_Option = ttk.Combobox(demucs_frame, value=CHUNKS, width=MENU_COMBOBOX_WIDTH, textvariable=self.chunks_demucs_var)
-        self.chunks_demucs_Option.grid(row=8,column=0,padx=0,pady=5)
+        self.chunks_demucs_Option.grid(row=18,column=0,padx=0,pady=5)
         self.combobox_entry_validation(self.chunks_demucs_Option, self.chunks_demucs_var, REG_CHUNKS, CHUNKS)
         self.help_hints(self.chunks_demucs_Label, text=CHUNKS_HELP)
         
         self.margin_demucs_Label = self.menu_sub_LABEL_SET(demucs_frame, 'Chunk Margin')
-        self.margin_demucs_Label.grid(row=9,column=0,padx=0,pady=5)
+        self.margin_demucs_Label.grid(row=19,column=0,padx=0,pady=5)
         self.margin_demucs_Option = ttk.Combobox(demucs_frame, value=MARGIN_SIZE, width=MENU_COMBOBOX_WIDTH, textvariable=self.margin_demucs_var)
-        self.margin_demucs_Option.grid(row=10,column=0,padx=0,pady=5)
+        self.margin_demucs_Option.grid(row=20,column=0,padx=0,pady=5)
         self.combobox_entry_validation(self.margin_Option, self.margin_demucs_var, REG_MARGIN, MARGIN_SIZE)
         self.help_hints(self.margin_demucs_Label, text=MARGIN_HELP)
         
         self.is_chunk_demucs_Option = ttk.Checkbutton(demucs_frame, text='Enable Chunks', width=DEMUCS_CHECKBOXS_WIDTH, variable=self.is_chunk_demucs_var, command=chunks_toggle) 
-        self.is_chunk_demucs_Option.grid(row=11,column=0,padx=0,pady=0)
+        self.is_chunk_demucs_Option.grid(row=21,column=0,padx=0,pady=0)
         self.help_hints(self.is_chunk_demucs_Option, text=IS_CHUNK_DEMUCS_HELP)
         
         self.is_split_mode_Option = ttk.Checkbutton(demucs_frame, text='Split Mode', width=DEMUCS_CHECKBOXS_WIDTH, variable=self.is_split_mode_var) 
-        self.is_split_mode_Option.grid(row=12,column=0,padx=0,pady=0)
+        self.is_split_mode_Option.grid(row=22,column=0,padx=0,pady=0)
         self.help_hints(self.is_split_mode_Option, text=IS_SPLIT_MODE_HELP)
         
+        self.is_demucs_batch_shifts_Option = ttk.Checkbutton(demucs_frame, text='Batch Shifts', width=DEMUCS_CHECKBOXS_WIDTH, variable=self.is_demucs_batch_shifts_var) 
+        self.is_demucs_batch_shifts_Option.grid(row=23,column=0,padx=0,pady=0)
+        self.help_hints(self.is_demucs_batch_shifts_Option, text=IS_DEMUCS_BATCH_SHIFTS_HELP)
+        
+        self.is_demucs_concurrent_models_Option = ttk.Checkbutton(demucs_frame, text='Concurrent Models', width=DEMUCS_CHECKBOXS_WIDTH, variable=self.is_demucs_concurrent_models_var) 
+        self.is_demucs_concurrent_models_Option.grid(row=24,column=0,padx=0,pady=0)
+        self.help_hints(self.is_demucs_concurrent_models_Option, text=IS_DEMUCS_CONCURRENT_MODELS_HELP)
+        
         self.is_demucs_combine_stems_Option = ttk.Checkbutton(demucs_frame, text='Combine Stems', width=DEMUCS_CHECKBOXS_WIDTH, variable=self.is_demucs_combine_stems_var) 
-        self.is_demucs_combine_stems_Option.grid(row=13,column=0,padx=0,pady=0)
+        self.is_demucs_combine_stems_Option.grid(row=25,column=0,padx=0,pady=0)
         self.help_hints(self.is_demucs_combine_stems_Option, text=IS_DEMUCS_COMBINE_STEMS_HELP)
         
         is_invert_spec_Option = ttk.Checkbutton(demucs_frame, text='Spectral Inversion', width=DEMUCS_CHECKBOXS_WIDTH, variable=self.is_invert_spec_var) 
-        is_invert_spec_Option.grid(row=14,column=0,padx=0,pady=0)
+        is_invert_spec_Option.grid(row=26,column=0,padx=0,pady=0)
         self.help_hints(is_invert_spec_Option, text=IS_INVERT_SPEC_HELP)
         
         self.open_demucs_model_dir_Button = ttk.Button(demucs_frame, text='Open Demucs Model Folder', command=lambda:OPEN_FILE_func(DEMUCS_MODELS_DIR))
-        self.open_demucs_model_dir_Button.grid(row=15,column=0,padx=0,pady=5)
+        self.open_demucs_model_dir_Button.grid(row=27,column=0,padx=0,pady=5)
         
         self.demucs_return_Button = ttk.Button(demucs_frame, text=BACK_TO_MAIN_MENU, command=lambda:(self.menu_advanced_demucs_options_close_window(), self.check_is_menu_settings_open()))
-        self.demucs_return_Button.grid(row=16,column=0,padx=0,pady=5)
+        self.demucs_return_Button.grid(row=28,column=0,padx=0,pady=5)
         
         self.demucs_close_Button = ttk.Button(demucs_frame, text='Close Window', command=lambda:self.menu_advanced_demucs_options_close_window())
-        self.demucs_close_Button.grid(row=17,column=0,padx=0,pady=5)
+        self.demucs_close_Button.grid(row=29,column=0,padx=0,pady=5)
         
         demucs_pre_proc_model_title_Label = self.menu_title_LABEL_SET(demucs_pre_model_frame, "Pre-process Model")
         demucs_pre_proc_model_title_Label.grid(row=0,column=0,padx=0,pady=15)
@@ -2564,26 +2619,49 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.combobox_entry_validation(compensate_Option, self.compensate_var, REG_COMPENSATION, VOL_COMPENSATION)
         self.help_hints(compensate_Label, text=COMPENSATE_HELP)
         
+        mdx_batch_size_Label = self.menu_sub_LABEL_SET(mdx_net_frame, 'Batch Size')
+        mdx_batch_size_Label.grid(row=7,column=0,padx=0,pady=5)
+        mdx_batch_size_Option = ttk.Combobox(mdx_net_frame, value=MDX_BATCH, width=MENU_COMBOBOX_WIDTH, textvariable=self.mdx_batch_size_var)
+        mdx_batch_size_Option.grid(row=8,column=0,padx=0,pady=5)
+        self.combobox_entry_validation(mdx_batch_size_Option, self.mdx_batch_size_var, REG_WINDOW, MDX_BATCH)
+        self.help_hints(mdx_batch_size_Label, text=MDX_BATCH_SIZE_HELP)
+        
+        mdx_session_profile_Label = self.menu_sub_LABEL_SET(mdx_net_frame, 'Session Profile')
+        mdx_session_profile_Label.grid(row=9,column=0,padx=0,pady=5)
+        mdx_session_profile_Option = ttk.OptionMenu(mdx_net_frame, self.mdx_session_profile_var, None, *MDX_SESSION_PROFILES)
+        mdx_session_profile_Option.grid(row=10,column=0,padx=0,pady=5)
+        self.help_hints(mdx_session_profile_Label, text=MDX_SESSION_PROFILE_HELP)
+        
+        mdx_precision_Label = self.menu_sub_LABEL_SET(mdx_net_frame, 'Model Precision')
+        mdx_precision_Label.grid(row=11,column=0,padx=0,pady=5)
+        mdx_precision_Option = ttk.OptionMenu(mdx_net_frame, self.mdx_precision_var, None, *MDX_PRECISIONS)
+        mdx_precision_Option.grid(row=12,column=0,padx=0,pady=5)
+        self.help_hints(mdx_precision_Label, text=MDX_PRECISION_HELP)
+        
         is_denoise_Option = ttk.Checkbutton(mdx_net_frame, text='Denoise Output', width=MDX_CHECKBOXS_WIDTH, variable=self.is_denoise_var) 
-        is_denoise_Option.grid(row=8,column=0,padx=0,pady=0)
+        is_denoise_Option.grid(row=13,column=0,padx=0,pady=0)
         self.help_hints(is_denoise_Option, text=IS_DENOISE_HELP)
 
         is_invert_spec_Option = ttk.Checkbutton(mdx_net_frame, text='Spectral Inversion', width=MDX_CHECKBOXS_WIDTH, variable=self.is_invert_spec_var) 
-        is_invert_spec_Option.grid(row=9,column=0,padx=0,pady=0)
+        is_invert_spec_Option.grid(row=14,column=0,padx=0,pady=0)
         self.help_hints(is_invert_spec_Option, text=IS_INVERT_SPEC_HELP)
 
+        is_mdx_streaming_Option = ttk.Checkbutton(mdx_net_frame, text='Streaming Mode', width=MDX_CHECKBOXS_WIDTH, variable=self.is_mdx_streaming_var) 
+        is_mdx_streaming_Option.grid(row=15,column=0,padx=0,pady=0)
+        self.help_hints(is_mdx_streaming_Option, text=IS_MDX_STREAMING_HELP)
+
         clear_mdx_cache_Button = ttk.Button(mdx_net_frame, text='Clear Auto-Set Cache', command=lambda:self.clear_cache(MDX_ARCH_TYPE))
-        clear_mdx_cache_Button.grid(row=10,column=0,padx=0,pady=5)
+        clear_mdx_cache_Button.grid(row=16,column=0,padx=0,pady=5)
         self.help_hints(clear_mdx_cache_Button, text=CLEAR_CACHE_HELP)
         
         open_mdx_model_dir_Button = ttk.Button(mdx_net_frame, text='Open MDX-Net Models Folder', command=lambda:OPEN_FILE_func(MDX_MODELS_DIR))
-        open_mdx_model_dir_Button.grid(row=11,column=0,padx=0,pady=5)
+        open_mdx_model_dir_Button.grid(row=17,column=0,padx=0,pady=5)
         
         mdx_return_Button = ttk.Button(mdx_net_frame, text=BACK_TO_MAIN_MENU, command=lambda:(self.menu_advanced_mdx_options_close_window(), self.check_is_menu_settings_open()))
-        mdx_return_Button.grid(row=12,column=0,padx=0,pady=5)
+        mdx_return_Button.grid(row=18,column=0,padx=0,pady=5)
 
         mdx_close_Button = ttk.Button(mdx_net_frame, text='Close Window', command=lambda:self.menu_advanced_mdx_options_close_window())
-        mdx_close_Button.grid(row=13,column=0,padx=0,pady=5)
+        mdx_close_Button.grid(row=19,column=0,padx=0,pady=5)
         
         self.menu_placement(mdx_net_opt, "Advanced MDX-Net Options", is_help_hints=True, close_function=self.menu_advanced_mdx_options_close_window)
 
@@ -4319,6 +4397,9 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         """End of process actions"""
         
         self.cached_sources_clear()
+        onnx_session_pool.clear()
+        demucs_model_pool.clear()
+        vr_band_cache.clear()
         self.clear_cache_torch = True
         self.conversion_Button_Text_var.set(START_PROCESSING)
         self.conversion_Button.configure(state=tk.NORMAL)
@@ -4672,6 +4753,7 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.is_output_image_var = tk.BooleanVar(value=data['is_output_image'])
         self.is_post_process_var = tk.BooleanVar(value=data['is_post_process'])
         self.is_high_end_process_var = tk.BooleanVar(value=data['is_high_end_process'])
+        self.is_vr_streaming_var = tk.BooleanVar(value=data['is_vr_streaming'])
         self.post_process_threshold_var = tk.StringVar(value=data['post_process_threshold'])
         self.vr_voc_inst_secondary_model_var = tk.StringVar(value=data['vr_voc_inst_secondary_model'])
         self.vr_other_secondary_model_var = tk.StringVar(value=data['vr_other_secondary_model'])
@@ -4687,6 +4769,11 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.demucs_model_var = tk.StringVar(value=data['demucs_model'])
         self.segment_var = tk.StringVar(value=data['segment'])
         self.overlap_var = tk.StringVar(value=data['overlap'])
+        self.segment_batch_var = tk.StringVar(value=data['segment_batch'])
+        self.demucs_cpu_workers_var = tk.StringVar(value=data['demucs_cpu_workers'])
+        self.demucs_cpu_threads_var = tk.StringVar(value=data['demucs_cpu_threads'])
+        self.demucs_attention_var = tk.StringVar(value=data['demucs_attention'])
+        self.demucs_backend_var = tk.StringVar(value=data['demucs_backend'])
         self.shifts_var = tk.StringVar(value=data['shifts'])
         self.chunks_demucs_var = tk.StringVar(value=data['chunks_demucs'])
         self.margin_demucs_var = tk.StringVar(value=data['margin_demucs'])
@@ -4695,6 +4782,8 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.is_secondary_stem_only_Demucs_var = tk.BooleanVar(value=data['is_secondary_stem_only_Demucs'])
         self.is_split_mode_var = tk.BooleanVar(value=data['is_split_mode'])
         self.is_demucs_combine_stems_var = tk.BooleanVar(value=data['is_demucs_combine_stems'])
+        self.is_demucs_batch_shifts_var = tk.BooleanVar(value=data['is_demucs_batch_shifts'])
+        self.is_demucs_concurrent_models_var = tk.BooleanVar(value=data['is_demucs_concurrent_models'])
         self.demucs_voc_inst_secondary_model_var = tk.StringVar(value=data['demucs_voc_inst_secondary_model'])
         self.demucs_other_secondary_model_var = tk.StringVar(value=data['demucs_other_secondary_model'])
         self.demucs_bass_secondary_model_var = tk.StringVar(value=data['demucs_bass_secondary_model'])
@@ -4715,6 +4804,10 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.compensate_var = tk.StringVar(value=data['compensate'])
         self.is_denoise_var = tk.BooleanVar(value=data['is_denoise'])
         self.is_invert_spec_var = tk.BooleanVar(value=data['is_invert_spec'])
+        self.mdx_batch_size_var = tk.StringVar(value=data['mdx_batch_size'])
+        self.mdx_session_profile_var = tk.StringVar(value=data['mdx_session_profile'])
+        self.mdx_precision_var = tk.StringVar(value=data['mdx_precision'])
+        self.is_mdx_streaming_var = tk.BooleanVar(value=data['is_mdx_streaming'])
         self.mdx_voc_inst_secondary_model_var = tk.StringVar(value=data['mdx_voc_inst_secondary_model'])
         self.mdx_other_secondary_model_var = tk.StringVar(value=data['mdx_other_secondary_model'])
         self.mdx_bass_secondary_model_var = tk.StringVar(value=data['mdx_bass_secondary_model'])
@@ -4752,6 +4845,7 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.help_hints_var = tk.BooleanVar(value=data['help_hints_var'])
         self.model_sample_mode_var = tk.BooleanVar(value=data['model_sample_mode'])
         self.model_sample_mode_duration_var = tk.StringVar(value=data['model_sample_mode_duration'])
+        self.auto_memory_budget_var = tk.StringVar(value=data['auto_memory_budget'])
         self.model_sample_mode_duration_checkbox_var = tk.StringVar(value=SAMPLE_MODE_CHECKBOX(self.model_sample_mode_duration_var.get()))
         
         #Path Vars
@@ -4776,6 +4870,7 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             self.is_output_image_var.set(loaded_setting['is_output_image'])
             self.is_post_process_var.set(loaded_setting['is_post_process'])
             self.is_high_end_process_var.set(loaded_setting['is_high_end_process'])
+            self.is_vr_streaming_var.set(loaded_setting['is_vr_streaming'])
             self.post_process_threshold_var.set(loaded_setting['post_process_threshold'])
             self.vr_voc_inst_secondary_model_var.set(loaded_setting['vr_voc_inst_secondary_model'])
             self.vr_other_secondary_model_var.set(loaded_setting['vr_other_secondary_model'])
@@ -4791,6 +4886,11 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             self.demucs_model_var.set(loaded_setting['demucs_model'])
             self.segment_var.set(loaded_setting['segment'])
             self.overlap_var.set(loaded_setting['overlap'])
+            self.segment_batch_var.set(loaded_setting['segment_batch'])
+            self.demucs_cpu_workers_var.set(loaded_setting['demucs_cpu_workers'])
+            self.demucs_cpu_threads_var.set(loaded_setting['demucs_cpu_threads'])
+            self.demucs_attention_var.set(loaded_setting['demucs_attention'])
+            self.demucs_backend_var.set(loaded_setting['demucs_backend'])
             self.shifts_var.set(loaded_setting['shifts'])
             self.chunks_demucs_var.set(loaded_setting['chunks_demucs'])
             self.margin_demucs_var.set(loaded_setting['margin_demucs'])
@@ -4799,6 +4899,8 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             self.is_secondary_stem_only_Demucs_var.set(loaded_setting['is_secondary_stem_only_Demucs'])
             self.is_split_mode_var.set(loaded_setting['is_split_mode'])
             self.is_demucs_combine_stems_var.set(loaded_setting['is_demucs_combine_stems'])
+            self.is_demucs_batch_shifts_var.set(loaded_setting['is_demucs_batch_shifts'])
+            self.is_demucs_concurrent_models_var.set(loaded_setting['is_demucs_concurrent_models'])
             self.demucs_voc_inst_secondary_model_var.set(loaded_setting['demucs_voc_inst_secondary_model'])
             self.demucs_other_secondary_model_var.set(loaded_setting['demucs_other_secondary_model'])
             self.demucs_bass_secondary_model_var.set(loaded_setting['demucs_bass_secondary_model'])
@@ -4821,6 +4923,10 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             self.compensate_var.set(loaded_setting['compensate'])
             self.is_denoise_var.set(loaded_setting['is_denoise'])
             self.is_invert_spec_var.set(loaded_setting['is_invert_spec'])
+            self.mdx_batch_size_var.set(loaded_setting['mdx_batch_size'])
+            self.mdx_session_profile_var.set(loaded_setting['mdx_session_profile'])
+            self.mdx_precision_var.set(loaded_setting['mdx_precision'])
+            self.is_mdx_streaming_var.set(loaded_setting['is_mdx_streaming'])
             self.mdx_voc_inst_secondary_model_var.set(loaded_setting['mdx_voc_inst_secondary_model'])
             self.mdx_other_secondary_model_var.set(loaded_setting['mdx_other_secondary_model'])
             self.mdx_bass_secondary_model_var.set(loaded_setting['mdx_bass_secondary_model'])
@@ -4857,6 +4963,7 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
         self.model_sample_mode_var.set(loaded_setting['model_sample_mode'])
         self.model_sample_mode_duration_var.set(loaded_setting['model_sample_mode_duration'])
         self.model_sample_mode_duration_checkbox_var.set(SAMPLE_MODE_CHECKBOX(self.model_sample_mode_duration_var.get()))
+        self.auto_memory_budget_var.set(loaded_setting['auto_memory_budget'])
         
     def save_values(self, app_close=True):
         """Saves application data"""
@@ -4872,6 +4979,7 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             'is_output_image': self.is_output_image_var.get(),
             'is_post_process': self.is_post_process_var.get(),
             'is_high_end_process': self.is_high_end_process_var.get(),
+            'is_vr_streaming': self.is_vr_streaming_var.get(),
             'post_process_threshold': self.post_process_threshold_var.get(),
             'vr_voc_inst_secondary_model': self.vr_voc_inst_secondary_model_var.get(),
             'vr_other_secondary_model': self.vr_other_secondary_model_var.get(),
@@ -4885,6 +4993,11 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             'demucs_model': self.demucs_model_var.get(),
             'segment': self.segment_var.get(),
             'overlap': self.overlap_var.get(),
+            'segment_batch': self.segment_batch_var.get(),
+            'demucs_cpu_workers': self.demucs_cpu_workers_var.get(),
+            'demucs_cpu_threads': self.demucs_cpu_threads_var.get(),
+            'demucs_attention': self.demucs_attention_var.get(),
+            'demucs_backend': self.demucs_backend_var.get(),
             'shifts': self.shifts_var.get(),
             'chunks_demucs': self.chunks_demucs_var.get(),
             'margin_demucs': self.margin_demucs_var.get(),
@@ -4893,6 +5006,8 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             'is_secondary_stem_only_Demucs': self.is_secondary_stem_only_Demucs_var.get(),
             'is_split_mode': self.is_split_mode_var.get(),
             'is_demucs_combine_stems': self.is_demucs_combine_stems_var.get(),
+            'is_demucs_batch_shifts': self.is_demucs_batch_shifts_var.get(),
+            'is_demucs_concurrent_models': self.is_demucs_concurrent_models_var.get(),
             'demucs_voc_inst_secondary_model': self.demucs_voc_inst_secondary_model_var.get(),
             'demucs_other_secondary_model': self.demucs_other_secondary_model_var.get(),
             'demucs_bass_secondary_model': self.demucs_bass_secondary_model_var.get(),
@@ -4911,6 +5026,10 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             'compensate': self.compensate_var.get(),
             'is_denoise': self.is_denoise_var.get(),
             'is_invert_spec': self.is_invert_spec_var.get(), 
+            'mdx_batch_size': self.mdx_batch_size_var.get(),
+            'mdx_session_profile': self.mdx_session_profile_var.get(),
+            'mdx_precision': self.mdx_precision_var.get(),
+            'is_mdx_streaming': self.is_mdx_streaming_var.get(),
             'mdx_voc_inst_secondary_model': self.mdx_voc_inst_secondary_model_var.get(),
             'mdx_other_secondary_model': self.mdx_other_secondary_model_var.get(),
             'mdx_bass_secondary_model': self.mdx_bass_secondary_model_var.get(),
@@ -4941,7 +5060,8 @@ class MainWindow(TkinterDnD.Tk if is_dnd_compatible else tk.Tk):
             'user_code': self.user_code_var.get(),
             'help_hints_var': self.help_hints_var.get(),
             'model_sample_mode': self.model_sample_mode_var.get(),
-            'model_sample_mode_duration': self.model_sample_mode_duration_var.get()
+            'model_sample_mode_duration': self.model_sample_mode_duration_var.get(),
+            'auto_memory_budget': self.auto_memory_budget_var.get()
             }
 
         other_data = {
@@ -9,6 +9,7 @@ inteprolation between chunks, as well as the "shift trick".
 """
 from concurrent.futures import ThreadPoolExecutor
 import random
+import time
 import typing as tp
 from multiprocessing import Process,Queue,Pipe
 
@@ -20,7 +21,7 @@ import tkinter as tk
 
 from .demucs import Demucs
 from .hdemucs import HDemucs
-from .utils import center_trim, DummyPoolExecutor
+from .utils import center_trim, DummyPoolExecutor, OverlapAdd
 
 Model = tp.Union[Demucs, HDemucs]
 
@@ -121,7 +122,7 @@ def tensor_chunk(tensor_or_chunk):
         assert isinstance(tensor_or_chunk, th.Tensor)
         return TensorChunk(tensor_or_chunk)
 
-def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power=1., static_shifts=1, set_progress_bar=None, device=None, progress=False, num_workers=0, pool=None): 
+def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power=1., static_shifts=1, set_progress_bar=None, device=None, progress=False, num_workers=0, pool=None, segment_batch_size=1, batch_shifts=False, model_pool=None, model_times=None, accumulation_dtype=None): 
     """
     Apply model to a given mixture.
 
@@ -138,6 +139,17 @@ def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power
             execute the computation, otherwise `mix.device` is assumed.
             When `device` is different from `mix.device`, only local computations will
             be on `device`, while the entire tracks will be stored on `mix.device`.
+        segment_batch_size (int): with `split`, the number of segments that are
+            padded to the same length and passed through the model as one batch.
+        batch_shifts (bool): with `split` and `shifts`, the segments of all shifted
+            copies are batched together and share a single overlap-add buffer
+            instead of running one full pass per shift.
+        model_pool (Executor or None): if provided, the models of a bag are submitted to
+            it and can run concurrently, otherwise they run one after another.
+        model_times (list[float] or None): if provided, the run time of the k-th model
+            of a bag is added to `model_times[k]`.
+        accumulation_dtype (torch.dtype or None): dtype of the split mode overlap-add
+            buffer, float16 or bfloat16 halve its memory.
     """
     
     global fut_length
@@ -164,6 +176,9 @@ def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power
         'pool': pool,
         'set_progress_bar': set_progress_bar,
         'static_shifts': static_shifts,
+        'segment_batch_size': segment_batch_size,
+        'batch_shifts': batch_shifts,
+        'accumulation_dtype': accumulation_dtype,
     }
     
     if isinstance(model, BagOfModels):
@@ -171,23 +186,22 @@ def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power
         # We explicitely apply multiple times `apply_model` so that the random shifts
         # are different for each model.
 
-        estimates = 0
+        batch, channels, length = mix.shape
+        estimates = th.zeros(batch, len(model.sources), channels, length, device=mix.device)
         totals = [0] * len(model.sources)
         bag_num = len(model.models)
         fut_length = 0
         prog_bar = 0
-        current_model = 0 #(bag_num + 1)
-        for sub_model, weight in zip(model.models, model.weights):
-            original_model_device = next(iter(sub_model.parameters())).device
-            sub_model.to(device)
-            fut_length += fut_length
-            current_model += 1
-            out = apply_model(sub_model, mix, **kwargs)
-            sub_model.to(original_model_device)
+        if model_pool is None:
+            model_pool = DummyPoolExecutor()
+        futures = [model_pool.submit(apply_sub_model, sub_model, mix, **kwargs) for sub_model in model.models]
+        for index, (future, weight) in enumerate(zip(futures, model.weights)):
+            out, run_time = future.result()
+            if model_times is not None:
+                model_times[index] += run_time
             for k, inst_weight in enumerate(weight):
-                out[:, k, :, :] *= inst_weight
+                estimates[:, k].add_(out[:, k], alpha=inst_weight)
                 totals[k] += inst_weight
-            estimates += out
             del out
 
         for k in range(estimates.shape[1]):
@@ -199,7 +213,7 @@ def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power
     assert transition_power >= 1, "transition_power < 1 leads to weird behavior."
     batch, channels, length = mix.shape
     
-    if shifts:
+    if shifts and not (split and batch_shifts):
         kwargs['shifts'] = 0
         max_shift = int(0.5 * model.samplerate)
         mix = tensor_chunk(mix)
@@ -214,41 +228,35 @@ def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power
         return out
     elif split:
         kwargs['split'] = False
-        out = th.zeros(batch, len(model.sources), channels, length, device=mix.device)
-        sum_weight = th.zeros(length, device=mix.device)
+        if shifts:
+            # The shifted copies are views of the padded mix, so their segments
+            # can be batched together and added up in padded coordinates.
+            max_shift = int(0.5 * model.samplerate)
+            mix = tensor_chunk(mix).padded(length + 2 * max_shift)
+            views = [(offset, length + max_shift - offset) for offset in (random.randint(0, max_shift) for _ in range(shifts))]
+        else:
+            max_shift = 0
+            views = [(0, length)]
         segment = int(model.samplerate * model.segment)
         stride = int((1 - overlap) * segment)
-        offsets = range(0, length, stride)
+        offsets = [(view_offset + offset, min(segment, view_length - offset)) for view_offset, view_length in views for offset in range(0, view_length, stride)]
+        out = OverlapAdd((batch, len(model.sources), channels, length + 2 * max_shift), offsets, segment, transition_power, mix.device, accumulation_dtype)
+        assert out.sum_weight[max_shift:max_shift + length].min() > 0
         scale = float(format(stride / model.samplerate, ".2f"))
-        # We start from a triangle shaped weight, with maximal weight in the middle
-        # of the segment. Then we normalize and take to the power `transition_power`.
-        # Large values of transition power will lead to sharper transitions.
-        weight = th.cat([th.arange(1, segment // 2 + 1, device=device),
-                         th.arange(segment - segment // 2, 0, -1, device=device)])
-        assert len(weight) == segment
-        # If the overlap < 50%, this will translate to linear transition when
-        # transition_power is 1.
-        weight = (weight / weight.max())**transition_power
         futures = []
-        for offset in offsets:
-            chunk = TensorChunk(mix, offset, segment)
-            future = pool.submit(apply_model, model, chunk, **kwargs)
-            futures.append((future, offset))
-            offset += segment
+        for batch_offsets, chunks in batch_chunks(model, mix, offsets, segment_batch_size):
+            future = pool.submit(apply_model_batch, model, chunks, device)
+            futures.append((future, batch_offsets))
         if progress:
-            futures = tqdm.tqdm(futures, unit_scale=scale, ncols=120, unit='seconds')
-        for future, offset in futures:
+            futures = tqdm.tqdm(futures, unit_scale=scale * segment_batch_size, ncols=120, unit='seconds')
+        for future, batch_offsets in futures:
             if set_progress_bar:
-                fut_length = (len(futures) * bag_num * static_shifts)
-                prog_bar += 1
+                fut_length = (len(offsets) * bag_num * (1 if shifts else static_shifts))
+                prog_bar += len(batch_offsets)
                 set_progress_bar(0.1, (0.8/fut_length*prog_bar))
-            chunk_out = future.result()
-            chunk_length = chunk_out.shape[-1]
-            out[..., offset:offset + segment] += (weight[:chunk_length] * chunk_out).to(mix.device)
-            sum_weight[offset:offset + segment] += weight[:chunk_length].to(mix.device)
-        assert sum_weight.min() > 0
-        out /= sum_weight
-        return out
+            for chunk_out, offset in zip(future.result(), batch_offsets):
+                out.add(chunk_out, offset)
+        return out.result()[..., max_shift:max_shift + length]
     else:
         if hasattr(model, 'valid_length'):
             valid_length = model.valid_length(length)
@@ -259,6 +267,42 @@ def apply_model(model, mix, shifts=1, split=True, overlap=0.25, transition_power
         with th.no_grad():
             out = model(padded_mix)
         return center_trim(out, length)
+
+def apply_sub_model(model, mix, **kwargs):
+    """Applies one model of a bag on `kwargs['device']`, returns its output and run time"""
+    start_time = time.perf_counter()
+    original_model_device = next(iter(model.parameters())).device
+    model.to(kwargs['device'])
+    out = apply_model(model, mix, **kwargs)
+    model.to(original_model_device)
+    return out, time.perf_counter() - start_time
+
+def batch_chunks(model, mix, offsets, segment_batch_size):
+    """
+    Groups the (offset, length) segments of `mix` into batches of at most `segment_batch_size`.
+    Only segments that are padded to the same valid length can share a batch.
+    """
+    batch_offsets, batch, valid_length = [], [], None
+    for offset, segment in offsets:
+        chunk = TensorChunk(mix, offset, segment)
+        chunk_valid_length = model.valid_length(chunk.length) if hasattr(model, 'valid_length') else chunk.length
+        if batch and (len(batch) == segment_batch_size or chunk_valid_length != valid_length):
+            yield batch_offsets, batch
+            batch_offsets, batch = [], []
+        batch_offsets.append(offset)
+        batch.append(chunk)
+        valid_length = chunk_valid_length
+    if batch:
+        yield batch_offsets, batch
+
+def apply_model_batch(model, chunks, device):
+    """Runs `chunks` through the model in a single forward pass and returns the output of each chunk"""
+    length = chunks[0].length
+    valid_length = model.valid_length(length) if hasattr(model, 'valid_length') else length
+    padded_mix = th.cat([chunk.padded(valid_length) for chunk in chunks]).to(device)
+    with th.no_grad():
+        out = model(padded_mix)
+    return [center_trim(chunk_out, chunk.length) for chunk_out, chunk in zip(out.split(len(out) // len(chunks)), chunks)]
     
 def demucs_segments(demucs_segment, demucs_model):
     
@@ -13,7 +13,7 @@ from torch import nn
 from torch.nn import functional as F
 
 from .states import capture_init
-from .utils import center_trim, unfold
+from .utils import center_trim, constant_cache, unfold
 
 
 class BLSTM(nn.Module):
@@ -166,6 +166,25 @@ class DConv(nn.Module):
         return x
 
 
+@constant_cache
+def local_state_kernels(T: int, nfreqs: int, ndecay: int, device, dtype):
+    """Returns the frequency and decay kernels of `LocalState` (None when unused), and
+    the mask of the self references, which only depend on the number of time steps."""
+    indexes = torch.arange(T, device=device, dtype=dtype)
+    # left index are keys, right index are queries
+    delta = indexes[:, None] - indexes[None, :]
+    freq_kernel = decay_kernel = None
+    if nfreqs:
+        periods = torch.arange(1, nfreqs + 1, device=device, dtype=dtype)
+        freq_kernel = torch.cos(2 * math.pi * delta / periods.view(-1, 1, 1))
+    if ndecay:
+        decays = torch.arange(1, ndecay + 1, device=device, dtype=dtype)
+        decay_kernel = - decays.view(-1, 1, 1) * delta.abs() / ndecay**0.5
+    # ONNX Runtime has no boolean EyeLike.
+    eye = torch.eye(T, device=device, dtype=dtype) > 0
+    return freq_kernel, decay_kernel, eye
+
+
 class LocalState(nn.Module):
     """Local state allows to have attention based only on data (no positional embedding),
     but while setting a constraint on the time window (e.g. decaying penalty term).
@@ -194,9 +213,7 @@ class LocalState(nn.Module):
     def forward(self, x):
         B, C, T = x.shape
         heads = self.heads
-        indexes = torch.arange(T, device=x.device, dtype=x.dtype)
-        # left index are keys, right index are queries
-        delta = indexes[:, None] - indexes[None, :]
+        freq_kernel, decay_kernel, eye = local_state_kernels(T, self.nfreqs, self.ndecay, x.device, x.dtype)
 
         queries = self.query(x).view(B, heads, -1, T)
         keys = self.key(x).view(B, heads, -1, T)
@@ -204,19 +221,15 @@ class LocalState(nn.Module):
         dots = torch.einsum("bhct,bhcs->bhts", keys, queries)
         dots /= keys.shape[2]**0.5
         if self.nfreqs:
-            periods = torch.arange(1, self.nfreqs + 1, device=x.device, dtype=x.dtype)
-            freq_kernel = torch.cos(2 * math.pi * delta / periods.view(-1, 1, 1))
             freq_q = self.query_freqs(x).view(B, heads, -1, T) / self.nfreqs ** 0.5
             dots += torch.einsum("fts,bhfs->bhts", freq_kernel, freq_q)
         if self.ndecay:
-            decays = torch.arange(1, self.ndecay + 1, device=x.device, dtype=x.dtype)
             decay_q = self.query_decay(x).view(B, heads, -1, T)
             decay_q = torch.sigmoid(decay_q) / 2
-            decay_kernel = - decays.view(-1, 1, 1) * delta.abs() / self.ndecay**0.5
             dots += torch.einsum("fts,bhfs->bhts", decay_kernel, decay_q)
 
         # Kill self reference.
-        dots.masked_fill_(torch.eye(T, device=dots.device, dtype=torch.bool), -100)
+        dots.masked_fill_(eye, -100)
         weights = torch.softmax(dots, dim=2)
 
         content = self.content(x).view(B, heads, -1, T)
@@ -0,0 +1,163 @@
+"""
+Static shape export of the network part of HTDemucs and HDemucs models.
+
+The STFT, masking (including Wiener filtering) and iSTFT stay in PyTorch, only
+`_core` is exported for one input length, usually the training segment. A model
+runs an exported artifact once it is set as its `exported_core`, for inputs of
+that exact length.
+"""
+
+from abc import ABC, abstractmethod
+import inspect
+import os
+
+import torch
+from torch import nn
+
+from .apply import BagOfModels
+from .hdemucs import HDemucs
+from .htdemucs import HTDemucs
+from .transformer import set_attention_backend
+
+EXPORT_FORMATS = {"onnx": ".onnx", "torchscript": ".pt"}
+
+
+class DemucsCore(nn.Module):
+    """Wraps the network part of a model for tracing."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, mix, mag):
+        x, xt = self.model._core(mix, mag)
+        return (x,) if xt is None else (x, xt)
+
+
+def get_exportable_models(model):
+    """Returns the models of `model` (the bag members of a `BagOfModels`) that can be exported."""
+    models = model.models if isinstance(model, BagOfModels) else [model]
+    assert all(isinstance(m, (HDemucs, HTDemucs)) for m in models), "only HDemucs and HTDemucs can be exported"
+    return models
+
+
+def export_length(model):
+    """Input length of the model for its current segment."""
+    length = int(model.segment * model.samplerate)
+    return model.valid_length(length) if hasattr(model, "valid_length") else length
+
+
+def get_export_path(model_path, index, length, export_format):
+    """Artifact of the `index`th model of the bag or model in `model_path`, for inputs of `length`."""
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(os.path.dirname(model_path), "exported",
+                        f"{name}_{index}_{length}{EXPORT_FORMATS[export_format]}")
+
+
+def example_inputs(model, length, batch_size=1):
+    mix = torch.randn(batch_size, model.audio_channels, length)
+    with torch.no_grad():
+        mag = model._magnitude(model._spec(mix))
+    return mix, mag
+
+
+def export_model(model, path, export_format, length=None):
+    """Exports the network part of `model` to `path` and returns the input length."""
+    length = length or export_length(model)
+    model = model.cpu().eval()
+    core = DemucsCore(model)
+    inputs = example_inputs(model, length)
+    outputs = ["x"] if isinstance(model, HDemucs) and not model.hybrid else ["x", "xt"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with torch.no_grad():
+        if export_format == "torchscript":
+            torch.jit.save(torch.jit.trace(core, inputs, check_trace=False), path)
+        else:
+            # the fused kernel of nn.MultiheadAttention has no ONNX equivalent.
+            backends = {m: m.attention_backend for m in model.modules() if hasattr(m, "attention_backend")}
+            set_attention_backend(model, "sdpa")
+            # recent PyTorch versions default to the dynamo exporter.
+            kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+            try:
+                torch.onnx.export(core, inputs, path, input_names=["mix", "mag"], output_names=outputs,
+                                  dynamic_axes={name: {0: "batch"} for name in ["mix", "mag"] + outputs},
+                                  opset_version=17, **kwargs)
+            finally:
+                for module, backend in backends.items():
+                    module.attention_backend = backend
+    return length
+
+
+class ExportedCore(ABC):
+    """Runs an exported network part in place of `_core` for inputs of `length`."""
+
+    def __init__(self, path, length, device="cpu"):
+        self.path = path
+        self.length = length
+        self.device = torch.device(device)
+
+    @abstractmethod
+    def run(self, mix, mag):
+        """Returns the outputs of the exported network part as a list of tensors."""
+
+    def __call__(self, mix, mag):
+        outputs = self.run(mix, mag)
+        return outputs[0], outputs[1] if len(outputs) > 1 else None
+
+
+class OnnxCore(ExportedCore):
+    def __init__(self, path, length, device="cpu", sess_options=None):
+        super().__init__(path, length, device)
+        import onnxruntime as ort
+        providers = ["CUDAExecutionProvider"] if self.device.type == "cuda" else ["CPUExecutionProvider"]
+        self.session = ort.InferenceSession(path, sess_options=sess_options, providers=providers)
+
+    def run(self, mix, mag):
+        inputs = {"mix": mix.detach().cpu().numpy(), "mag": mag.detach().cpu().numpy()}
+        return [torch.from_numpy(out).to(self.device) for out in self.session.run(None, inputs)]
+
+
+class TorchScriptCore(ExportedCore):
+    def __init__(self, path, length, device="cpu"):
+        super().__init__(path, length, device)
+        self.module = torch.jit.load(path, map_location=device)
+
+    def run(self, mix, mag):
+        return self.module(mix, mag)
+
+
+def load_exported_core(path, length, export_format, device="cpu"):
+    if export_format == "torchscript":
+        return TorchScriptCore(path, length, device)
+    return OnnxCore(path, length, device)
+
+
+def attach_exported_cores(model, model_path, export_format, device="cpu"):
+    """
+    Sets the exported artifacts of `model_path` for the current segments as the
+    `exported_core` of its models, or resets them all to eager execution when one
+    is missing. Returns True if all the artifacts were found. Artifacts already set
+    are kept, so a model reused between files doesn't reload them.
+    """
+    models = model.models if isinstance(model, BagOfModels) else [model]
+    cores = []
+
+    if export_format and all(isinstance(m, (HDemucs, HTDemucs)) for m in models):
+        for index, sub_model in enumerate(models):
+            length = export_length(sub_model)
+            path = get_export_path(model_path, index, length, export_format)
+            if not os.path.isfile(path):
+                break
+            core = sub_model.exported_core
+            if core is None or core.path != path or core.device != torch.device(device):
+                core = load_exported_core(path, length, export_format, device)
+            cores.append(core)
+
+    is_complete = bool(cores) and len(cores) == len(models)
+
+    for index, sub_model in enumerate(models):
+        if isinstance(sub_model, (HDemucs, HTDemucs)):
+            sub_model.exported_core = cores[index] if is_complete else None
+
+    return is_complete
@@ -500,3 +500,117 @@ def _covariance(y_j):
             Cj[:, :, index[0], index[1], :],
         )
     return Cj
+
+
+# Native complex versions of `wiener` and `expectation_maximization`. They take any
+# number of leading batch dimensions, so many windows are filtered in one call.
+
+def _invert_complex(M: torch.Tensor) -> torch.Tensor:
+    """Inverts complex matrices of shape (..., nb_channels, nb_channels),
+    analytically for 1 or 2 channels."""
+    nb_channels = M.shape[-1]
+    if nb_channels == 1:
+        return 1 / M
+    elif nb_channels == 2:
+        a, b, c, d = M[..., 0, 0], M[..., 0, 1], M[..., 1, 0], M[..., 1, 1]
+        inv_det = 1 / (a * d - b * c)
+        return torch.stack([torch.stack([d, -b], -1), torch.stack([-c, a], -1)], -2) * inv_det[..., None, None]
+    return torch.linalg.inv(M)
+
+
+def expectation_maximization_complex(y: torch.Tensor, x: torch.Tensor, iterations: int = 2, eps: float = 1e-10):
+    """
+    Same algorithm as :func:`expectation_maximization` on complex tensors, with the
+    statistics of each entry of the leading batch dimensions kept separate.
+
+    Args:
+        y (Tensor): [shape=(..., nb_frames, nb_bins, nb_channels, nb_sources)] complex
+            initial estimates for the sources
+        x (Tensor): [shape=(..., nb_frames, nb_bins, nb_channels)] complex STFT of the mixture
+    Returns:
+        y (Tensor): estimated sources after iterations, shape as the input `y`
+    """
+    nb_channels = x.shape[-1]
+    regularization = torch.sqrt(torch.as_tensor(eps)) * torch.eye(nb_channels, dtype=x.dtype, device=x.device)
+
+    for it in range(iterations):
+        # update the PSD as the average spectrogram over channels
+        v = torch.mean(y.real ** 2 + y.imag ** 2, dim=-2)
+
+        # update spatial covariance matrices (weighted update)
+        R = torch.einsum('...tfcs,...tfds->...fcds', y, y.conj())
+        R = R / (eps + v.sum(dim=-3))[..., None, None, :]
+
+        # mixture covariance, then y_j = v_j R_j inv(Cxx) x
+        Cxx = regularization + torch.einsum('...tfs,...fcds->...tfcd', v.to(x.dtype), R)
+        inv_Cxx_x = torch.einsum('...cd,...d->...c', _invert_complex(Cxx), x)
+        y = v[..., None, :] * torch.einsum('...fcds,...tfd->...tfcs', R, inv_Cxx_x)
+
+    return y
+
+
+def wiener_complex(
+    targets_spectrograms: torch.Tensor,
+    mix_stft: torch.Tensor,
+    iterations: int = 1,
+    residual: bool = False,
+    scale_factor: float = 10.0,
+    eps: float = 1e-10,
+):
+    """
+    :func:`wiener` without softmask on complex tensors, filtering each entry of the
+    leading batch dimensions independently.
+
+    Args:
+        targets_spectrograms (Tensor): [shape=(..., nb_frames, nb_bins, nb_channels, nb_sources)]
+        mix_stft (Tensor): [shape=(..., nb_frames, nb_bins, nb_channels)] complex
+    Returns:
+        Tensor: [shape=(..., nb_frames, nb_bins, nb_channels, nb_sources)] complex
+    """
+    y = torch.polar(targets_spectrograms, torch.angle(mix_stft)[..., None].expand_as(targets_spectrograms))
+
+    if residual:
+        y = torch.cat([y, mix_stft[..., None] - y.sum(dim=-1, keepdim=True)], dim=-1)
+
+    if iterations == 0:
+        return y
+
+    # Scales down the estimates of each batch entry for numerical stability
+    max_abs = mix_stft.abs().flatten(-3).max(dim=-1).values / scale_factor
+    max_abs = torch.clamp(max_abs, min=1.0)[..., None, None, None]
+    y = expectation_maximization_complex(y / max_abs[..., None], mix_stft / max_abs, iterations, eps=eps)
+
+    return y * max_abs[..., None]
+
+
+def wiener_windows(mag_out: torch.Tensor, mix_stft: torch.Tensor, iterations: int, residual: bool = False,
+                   window_length: int = 300, max_windows: int = 16):
+    """
+    Wiener filtering of model outputs over independent windows of `window_length` frames,
+    as done by Demucs. The windows of all batch items are filtered together, at most
+    `max_windows` at a time to bound the memory use on long inputs.
+
+    Args:
+        mag_out (Tensor): [shape=(B, S, C, Fq, T)] estimated magnitudes
+        mix_stft (Tensor): [shape=(B, C, Fq, T)] complex STFT of the mixture
+    Returns:
+        Tensor: [shape=(B, S, C, Fq, T)] complex STFT of the sources
+    """
+    B, S, C, Fq, T = mag_out.shape
+    nb_windows = -(-T // window_length)
+    pad = nb_windows * window_length - T
+
+    # Zero frames add nothing to the statistics of a window, so padding the
+    # last window gives the same result as filtering it shorter.
+    mag_out = nn.functional.pad(mag_out, (0, pad)).permute(0, 4, 3, 2, 1)
+    mix_stft = nn.functional.pad(mix_stft, (0, pad)).permute(0, 3, 2, 1)
+    mag_out = mag_out.reshape(B * nb_windows, window_length, Fq, C, S)
+    mix_stft = mix_stft.reshape(B * nb_windows, window_length, Fq, C)
+
+    out = torch.cat([wiener_complex(mag_out[pos:pos + max_windows], mix_stft[pos:pos + max_windows], iterations, residual=residual)
+                     for pos in range(0, B * nb_windows, max_windows)])
+    out = out.reshape(B, nb_windows * window_length, Fq, C, -1)[:, :T]
+    out = out.permute(0, 4, 3, 2, 1)
+    if residual:
+        out = out[:, :-1]
+    return out.contiguous()
@@ -12,10 +12,11 @@ import typing as tp
 import torch
 from torch import nn
 from torch.nn import functional as F
-from .filtering import wiener
+from .filtering import wiener_windows
 from .demucs import DConv, rescale_module
 from .states import capture_init
 from .spec import spectro, ispectro
+from .utils import arange
 
 def pad1d(x: torch.Tensor, paddings: tp.Tuple[int, int], mode: str = 'constant', value: float = 0.):
     """Tiny wrapper around F.pad, just to allow for reflect padding on small input.
@@ -452,6 +453,8 @@ class HDemucs(nn.Module):
         
         self.cac = cac
         self.wiener_residual = wiener_residual
+        # set to an `ExportedCore` to run the network part from an exported artifact.
+        self.exported_core = None
         self.audio_channels = audio_channels
         self.sources = sources
         self.kernel_size = kernel_size
@@ -657,30 +660,13 @@ class HDemucs(nn.Module):
             return self._wiener(m, z, niters)
 
     def _wiener(self, mag_out, mix_stft, niters):
-        # apply wiener filtering from OpenUnmix.
+        # apply wiener filtering from OpenUnmix, on all the 300 frames windows at once.
         init = mix_stft.dtype
         wiener_win_len = 300
         residual = self.wiener_residual
 
         B, S, C, Fq, T = mag_out.shape
-        mag_out = mag_out.permute(0, 4, 3, 2, 1)
-        mix_stft = torch.view_as_real(mix_stft.permute(0, 3, 2, 1))
-
-        outs = []
-        for sample in range(B):
-            pos = 0
-            out = []
-            for pos in range(0, T, wiener_win_len):
-                frame = slice(pos, pos + wiener_win_len)
-                z_out = wiener(
-                    mag_out[sample, frame], mix_stft[sample, frame], niters,
-                    residual=residual)
-                out.append(z_out.transpose(-1, -2))
-            outs.append(torch.cat(out, dim=0))
-        out = torch.view_as_complex(torch.stack(outs, 0))
-        out = out.permute(0, 4, 3, 2, 1).contiguous()
-        if residual:
-            out = out[:, :-1]
+        out = wiener_windows(mag_out, mix_stft, niters, residual=residual, window_length=wiener_win_len)
         assert list(out.shape) == [B, S, C, Fq, T]
         return out.to(init)
 
@@ -690,6 +676,26 @@ class HDemucs(nn.Module):
 
         z = self._spec(mix)
         mag = self._magnitude(z)
+
+        if self.exported_core is not None and self.exported_core.length == length:
+            x, xt = self.exported_core(mix, mag)
+        else:
+            x, xt = self._core(mix, mag)
+
+        zout = self._mask(z, x)
+        x = self._ispec(zout, length)
+
+        if self.hybrid:
+            x = xt + x
+        return x
+
+    def _core(self, mix, mag):
+        """
+        Network part of the forward pass, everything but the STFT, masking and iSTFT.
+        Returns the output of the spectrogram branch (B, S, C, Fq, T) and of the time
+        branch (B, S, C, length), None when not hybrid, `mag` being the output of `_magnitude`.
+        """
+        length = mix.shape[-1]
         x = mag
 
         B, C, Fq, T = x.shape
@@ -731,7 +737,7 @@ class HDemucs(nn.Module):
             if idx == 0 and self.freq_emb is not None:
                 # add frequency embedding to allow for non equivariant convolutions
                 # over the frequency axis.
-                frs = torch.arange(x.shape[-2], device=x.device)
+                frs = arange(x.shape[-2], x.device)
                 emb = self.freq_emb(frs).t()[None, :, :, None].expand_as(x)
                 x = x + self.freq_emb_scale * emb
 
@@ -770,13 +776,11 @@ class HDemucs(nn.Module):
         x = x.view(B, S, -1, Fq, T)
         x = x * std[:, None] + mean[:, None]
 
-        zout = self._mask(z, x)
-        x = self._ispec(zout, length)
-
         if self.hybrid:
             xt = xt.view(B, S, -1, length)
             xt = xt * stdt[:, None] + meant[:, None]
-            x = xt + x
-        return x
+        else:
+            xt = None
+        return x, xt
 
 
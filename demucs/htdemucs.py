@@ -9,7 +9,7 @@ This code contains the spectrogram and Hybrid version of Demucs.
 """
 import math
 
-from .filtering import wiener
+from .filtering import wiener_windows
 import torch
 from torch import nn
 from torch.nn import functional as F
@@ -21,6 +21,7 @@ from .transformer import CrossTransformerEncoder
 from .demucs import rescale_module
 from .states import capture_init
 from .spec import spectro, ispectro
+from .utils import arange
 from .hdemucs import pad1d, ScaledEmbedding, HEncLayer, MultiWrap, HDecLayer
 
 
@@ -223,6 +224,8 @@ class HTDemucs(nn.Module):
         super().__init__()
         self.cac = cac
         self.wiener_residual = wiener_residual
+        # set to an `ExportedCore` to run the network part from an exported artifact.
+        self.exported_core = None
         self.audio_channels = audio_channels
         self.sources = sources
         self.kernel_size = kernel_size
@@ -478,33 +481,13 @@ class HTDemucs(nn.Module):
             return self._wiener(m, z, niters)
 
     def _wiener(self, mag_out, mix_stft, niters):
-        # apply wiener filtering from OpenUnmix.
+        # apply wiener filtering from OpenUnmix, on all the 300 frames windows at once.
         init = mix_stft.dtype
         wiener_win_len = 300
         residual = self.wiener_residual
 
         B, S, C, Fq, T = mag_out.shape
-        mag_out = mag_out.permute(0, 4, 3, 2, 1)
-        mix_stft = torch.view_as_real(mix_stft.permute(0, 3, 2, 1))
-
-        outs = []
-        for sample in range(B):
-            pos = 0
-            out = []
-            for pos in range(0, T, wiener_win_len):
-                frame = slice(pos, pos + wiener_win_len)
-                z_out = wiener(
-                    mag_out[sample, frame],
-                    mix_stft[sample, frame],
-                    niters,
-                    residual=residual,
-                )
-                out.append(z_out.transpose(-1, -2))
-            outs.append(torch.cat(out, dim=0))
-        out = torch.view_as_complex(torch.stack(outs, 0))
-        out = out.permute(0, 4, 3, 2, 1).contiguous()
-        if residual:
-            out = out[:, :-1]
+        out = wiener_windows(mag_out, mix_stft, niters, residual=residual, window_length=wiener_win_len)
         assert list(out.shape) == [B, S, C, Fq, T]
         return out.to(init)
 
@@ -537,6 +520,32 @@ class HTDemucs(nn.Module):
                     mix = F.pad(mix, (0, training_length - length_pre_pad))
         z = self._spec(mix)
         mag = self._magnitude(z)
+
+        if self.exported_core is not None and self.exported_core.length == mix.shape[-1]:
+            x, xt = self.exported_core(mix, mag)
+        else:
+            x, xt = self._core(mix, mag)
+
+        zout = self._mask(z, x)
+        if self.use_train_segment:
+            if self.training:
+                x = self._ispec(zout, length)
+            else:
+                x = self._ispec(zout, training_length)
+        else:
+            x = self._ispec(zout, length)
+
+        x = xt + x
+        if length_pre_pad:
+            x = x[..., :length_pre_pad]
+        return x
+
+    def _core(self, mix, mag):
+        """
+        Network part of the forward pass, everything but the STFT, masking and iSTFT.
+        Returns the output of the spectrogram branch (B, S, C, Fq, T) and of the time
+        branch (B, S, C, length), `mag` being the output of `_magnitude`.
+        """
         x = mag
 
         B, C, Fq, T = x.shape
@@ -577,7 +586,7 @@ class HTDemucs(nn.Module):
             if idx == 0 and self.freq_emb is not None:
                 # add frequency embedding to allow for non equivariant convolutions
                 # over the frequency axis.
-                frs = torch.arange(x.shape[-2], device=x.device)
+                frs = arange(x.shape[-2], x.device)
                 emb = self.freq_emb(frs).t()[None, :, :, None].expand_as(x)
                 x = x + self.freq_emb_scale * emb
 
@@ -625,24 +634,7 @@ class HTDemucs(nn.Module):
         x = x.view(B, S, -1, Fq, T)
         x = x * std[:, None] + mean[:, None]
 
-        zout = self._mask(z, x)
-        if self.use_train_segment:
-            if self.training:
-                x = self._ispec(zout, length)
-            else:
-                x = self._ispec(zout, training_length)
-        else:
-            x = self._ispec(zout, length)
-
-        if self.use_train_segment:
-            if self.training:
-                xt = xt.view(B, S, -1, length)
-            else:
-                xt = xt.view(B, S, -1, training_length)
-        else:
-            xt = xt.view(B, S, -1, length)
+        # the mix is already padded to the training length when using it.
+        xt = xt.view(B, S, -1, mix.shape[-1])
         xt = xt * stdt[:, None] + meant[:, None]
-        x = xt + x
-        if length_pre_pad:
-            x = x[..., :length_pre_pad]
-        return x
+        return x, xt
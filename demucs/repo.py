@@ -8,6 +8,7 @@ A repo can either be the main remote repository stored in AWS, or a local reposi
 with your own models.
 """
 
+from functools import lru_cache
 from hashlib import sha256
 from pathlib import Path
 import typing as tp
@@ -26,7 +27,9 @@ class ModelLoadingError(RuntimeError):
     pass
 
 
-def check_checksum(path: Path, checksum: str):
+@lru_cache(maxsize=None)
+def file_sha256(path: Path, size: int, mtime: float) -> str:
+    """sha256 of a file, memoized by (path, size, mtime) so unchanged files are hashed once."""
     sha = sha256()
     with open(path, 'rb') as file:
         while True:
@@ -34,7 +37,16 @@ def check_checksum(path: Path, checksum: str):
             if not buf:
                 break
             sha.update(buf)
-    actual_checksum = sha.hexdigest()[:len(checksum)]
+    return sha.hexdigest()
+
+
+def file_key(path: Path) -> tp.Tuple[Path, int, float]:
+    stat = path.stat()
+    return path, stat.st_size, stat.st_mtime
+
+
+def check_checksum(path: Path, checksum: str):
+    actual_checksum = file_sha256(*file_key(Path(path)))[:len(checksum)]
     if actual_checksum != checksum:
         raise ModelLoadingError(f'Invalid checksum for file {path}, '
                                 f'expected {checksum} but got {actual_checksum}')
@@ -66,11 +78,20 @@ class RemoteRepo(ModelOnlyRepo):
 
 
 class LocalRepo(ModelOnlyRepo):
+    # Scan results by (root, size, mtime) of the folder, adding or removing
+    # a model changes the mtime of its folder.
+    _scans: tp.Dict[tp.Tuple[Path, int, float], tp.Tuple[dict, dict]] = {}
+
     def __init__(self, root: Path):
         self.root = root
         self.scan()
 
     def scan(self):
+        key = file_key(self.root)
+        if key in LocalRepo._scans:
+            models, checksums = LocalRepo._scans[key]
+            self._models, self._checksums = dict(models), dict(checksums)
+            return
         self._models = {}
         self._checksums = {}
         for file in self.root.iterdir():
@@ -86,6 +107,7 @@ class LocalRepo(ModelOnlyRepo):
                         f'Duplicate pre-trained model exist for signature {xp_sig}. '
                         'Please delete all but one.')
                 self._models[xp_sig] = file
+        LocalRepo._scans[key] = (dict(self._models), dict(self._checksums))
 
     def has_model(self, sig: str) -> bool:
         return sig in self._models
@@ -7,6 +7,13 @@
 
 import torch as th
 
+from .utils import constant_cache
+
+
+@constant_cache
+def hann_window(win_length, device, dtype):
+    return th.hann_window(win_length, device=device, dtype=dtype)
+
 
 def spectro(x, n_fft=512, hop_length=None, pad=0):
     *other, length = x.shape
@@ -14,7 +21,7 @@ def spectro(x, n_fft=512, hop_length=None, pad=0):
     z = th.stft(x,
                 n_fft * (1 + pad),
                 hop_length or n_fft // 4,
-                window=th.hann_window(n_fft).to(x),
+                window=hann_window(n_fft, x.device, x.dtype),
                 win_length=n_fft,
                 normalized=True,
                 center=True,
@@ -32,7 +39,7 @@ def ispectro(z, hop_length=None, length=None, pad=0):
     x = th.istft(z,
                  n_fft,
                  hop_length,
-                 window=th.hann_window(win_length).to(z.real),
+                 window=hann_window(win_length, z.device, z.real.dtype),
                  win_length=win_length,
                  normalized=True,
                  length=length,
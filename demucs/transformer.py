@@ -5,6 +5,7 @@
 # LICENSE file in the root directory of this source tree.
 # First author is Simon Rouard.
 
+import importlib.util
 import random
 import typing as tp
 
@@ -15,7 +16,10 @@ import numpy as np
 import math
 from einops import rearrange
 
+from .utils import constant_cache
 
+
+@constant_cache
 def create_sin_embedding(
     length: int, dim: int, shift: int = 0, device="cpu", max_period=10000
 ):
@@ -34,6 +38,7 @@ def create_sin_embedding(
     )
 
 
+@constant_cache
 def create_2d_sin_embedding(d_model, height, width, device="cpu", max_period=10000):
     """
     :param d_model: dimension of the model
@@ -115,6 +120,10 @@ def create_sin_embedding_cape(
     ).float()
 
 
+# Without augmentation the CAPE embedding only depends on its arguments.
+cached_sin_embedding_cape = constant_cache(create_sin_embedding_cape)
+
+
 def get_causal_mask(length):
     pos = torch.arange(length)
     return pos > pos[:, None]
@@ -190,6 +199,34 @@ def get_mask(
     mask_type can be a combination of multiple masks: for instance "diag_jmask_random"
     """
     from xformers.sparse import SparseCSRTensor
+
+    final_mask = get_dense_mask(
+        T1,
+        T2,
+        mask_type,
+        sparse_attn_window,
+        global_window,
+        mask_random_seed,
+        sparsity,
+        device,
+    )
+
+    return SparseCSRTensor.from_dense(final_mask[None])
+
+
+def get_dense_mask(
+    T1,
+    T2,
+    mask_type,
+    sparse_attn_window,
+    global_window,
+    mask_random_seed,
+    sparsity,
+    device,
+):
+    """
+    Return the boolean (T2, T1) mask behind `get_mask`, True where attention is allowed.
+    """
     # create a list
     mask_types = mask_type.split("_")
 
@@ -207,9 +244,51 @@ def get_mask(
         for mask in mask_types
     ]
 
-    final_mask = torch.stack(all_masks).sum(axis=0) > 0
+    return torch.stack(all_masks).sum(axis=0) > 0
 
-    return SparseCSRTensor.from_dense(final_mask[None])
+
+@constant_cache
+def get_block_sparse_mask(
+    T1,
+    T2,
+    mask_type,
+    sparse_attn_window,
+    global_window,
+    mask_random_seed,
+    sparsity,
+    device,
+    block_size=64,
+):
+    """
+    Block sparse layout of the `get_mask` mask for the "sdpa" attention backend.
+    Queries are grouped in blocks of `block_size` and each block only gets the key
+    blocks that at least one of its queries attends to. Returns the indexes of the
+    gathered keys (query blocks, keys) and their mask (query blocks, block_size, keys).
+    """
+    mask = get_dense_mask(
+        T1,
+        T2,
+        mask_type,
+        sparse_attn_window,
+        global_window,
+        mask_random_seed,
+        sparsity,
+        device,
+    )
+    query_blocks, key_blocks = -(-T2 // block_size), -(-T1 // block_size)
+    mask = F.pad(mask, (0, key_blocks * block_size - T1, 0, query_blocks * block_size - T2))
+    blocks = mask.view(query_blocks, block_size, key_blocks, block_size).any(3).any(1)
+
+    # active key blocks first, all query blocks get as many as the densest one.
+    active = int(blocks.sum(1).max())
+    order = torch.sort(blocks.int(), dim=1, descending=True, stable=True).indices[:, :active]
+    key_index = (order[..., None] * block_size + torch.arange(block_size, device=device)).flatten(1)
+    block_mask = mask.view(query_blocks, block_size, -1).gather(
+        2, key_index[:, None].expand(-1, block_size, -1)
+    )
+    # padding queries attend to nothing, which would give NaNs.
+    block_mask |= ~block_mask.any(-1, keepdim=True)
+    return key_index, block_mask
 
 
 class ScaledEmbedding(nn.Module):
@@ -335,6 +414,7 @@ class MyTransformerEncoderLayer(nn.TransformerEncoderLayer):
             )
             self.__setattr__("src_mask", torch.zeros(1, 1))
             self.mask_random_seed = mask_random_seed
+        self.attention_backend = "native"
 
     def forward(self, src, src_mask=None, src_key_padding_mask=None):
         """
@@ -344,7 +424,20 @@ class MyTransformerEncoderLayer(nn.TransformerEncoderLayer):
         device = src.device
         x = src
         T, B, C = x.shape
-        if self.sparse and not self.auto_sparsity:
+        if self.sparse and not self.auto_sparsity and self.attention_backend == "sdpa":
+            assert src_mask is None
+            length = x.shape[1] if self.self_attn.batch_first else x.shape[0]
+            src_mask = get_block_sparse_mask(
+                length,
+                length,
+                self.mask_type,
+                self.sparse_attn_window,
+                self.global_window,
+                self.mask_random_seed,
+                self.sparsity,
+                device,
+            )
+        elif self.sparse and not self.auto_sparsity:
             assert src_mask is None
             src_mask = self.src_mask
             if src_mask.shape[-1] != T:
@@ -376,6 +469,13 @@ class MyTransformerEncoderLayer(nn.TransformerEncoderLayer):
 
         return x
 
+    # self-attention block
+    def _sa_block(self, x, attn_mask, key_padding_mask, is_causal=False):
+        if self.attention_backend == "sdpa" and not self.auto_sparsity:
+            assert key_padding_mask is None
+            return self.dropout1(fused_attention(self.self_attn, x, x, attn_mask))
+        return super()._sa_block(x, attn_mask, key_padding_mask)
+
 
 class CrossTransformerEncoderLayer(nn.Module):
     def __init__(
@@ -462,6 +562,7 @@ class CrossTransformerEncoderLayer(nn.Module):
             if not auto_sparsity:
                 self.__setattr__("mask", torch.zeros(1, 1))
                 self.mask_random_seed = mask_random_seed
+        self.attention_backend = "native"
 
     def forward(self, q, k, mask=None):
         """
@@ -474,7 +575,20 @@ class CrossTransformerEncoderLayer(nn.Module):
         device = q.device
         T, B, C = q.shape
         S, B, C = k.shape
-        if self.sparse and not self.auto_sparsity:
+        if self.sparse and not self.auto_sparsity and self.attention_backend == "sdpa":
+            assert mask is None
+            dim = 1 if self.cross_attn.batch_first else 0
+            mask = get_block_sparse_mask(
+                k.shape[dim],
+                q.shape[dim],
+                self.mask_type,
+                self.sparse_attn_window,
+                self.global_window,
+                self.mask_random_seed,
+                self.sparsity,
+                device,
+            )
+        elif self.sparse and not self.auto_sparsity:
             assert mask is None
             mask = self.mask
             if mask.shape[-1] != S or mask.shape[-2] != T:
@@ -503,7 +617,10 @@ class CrossTransformerEncoderLayer(nn.Module):
 
     # self-attention block
     def _ca_block(self, q, k, attn_mask=None):
-        x = self.cross_attn(q, k, k, attn_mask=attn_mask, need_weights=False)[0]
+        if self.attention_backend == "sdpa" and not self.auto_sparsity:
+            x = fused_attention(self.cross_attn, q, k, attn_mask)
+        else:
+            x = self.cross_attn(q, k, k, attn_mask=attn_mask, need_weights=False)[0]
         return self.dropout1(x)
 
     # feed forward block
@@ -696,7 +813,7 @@ class CrossTransformerEncoder(nn.Module):
                     max_scale=self.cape_glob_loc_scale[2],
                 )
             else:
-                pos_emb = create_sin_embedding_cape(
+                pos_emb = cached_sin_embedding_cape(
                     T,
                     C,
                     B,
@@ -837,3 +954,104 @@ def dynamic_sparse_attention(query, key, value, sparsity, infer_sparsity=True, a
             bucket_query, bucket_key, sparsity, infer_sparsity)
     return sparse_memory_efficient_attention(
         query, key, value, row_offsets, column_indices, attn_bias)
+
+
+# ----------------- ATTENTION BACKENDS: -----------------------
+
+ATTENTION_BACKENDS = ["native", "sdpa"]
+
+
+def set_attention_backend(model, backend):
+    """
+    Selects how the transformer layers of `model` compute attention. "native" goes
+    through `nn.MultiheadAttention` (and xformers for sparse layers), "sdpa" through
+    `scaled_dot_product_attention` with a block sparse version of the sparse masks.
+    """
+    assert backend in ATTENTION_BACKENDS, backend
+    for module in model.modules():
+        if isinstance(module, (MyTransformerEncoderLayer, CrossTransformerEncoderLayer)):
+            module.attention_backend = backend
+
+
+def get_attention_backends(model):
+    """
+    Returns the backends of ATTENTION_BACKENDS that can run every transformer layer of
+    `model` with the installed packages. Sparse layers need xformers with "native", and
+    layers with automatic sparsity need it with both backends.
+    """
+    if importlib.util.find_spec("xformers") is not None:
+        return list(ATTENTION_BACKENDS)
+    layers = [module for module in model.modules()
+              if isinstance(module, (MyTransformerEncoderLayer, CrossTransformerEncoderLayer))]
+    backends = []
+    if not any(layer.sparse for layer in layers):
+        backends.append("native")
+    if not any(layer.sparse and layer.auto_sparsity for layer in layers):
+        backends.append("sdpa")
+    return backends
+
+
+def _sdpa(q, k, v, attn_mask=None, dropout_p=0.0):
+    # attn_mask is True where attention is allowed, as in scaled_dot_product_attention.
+    if hasattr(F, "scaled_dot_product_attention"):
+        return F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask, dropout_p=dropout_p)
+    att = q @ k.transpose(-2, -1) / k.shape[-1] ** 0.5
+    if attn_mask is not None:
+        att = att.masked_fill(~attn_mask, float("-inf")) if attn_mask.dtype == torch.bool else att + attn_mask
+    att = F.dropout(att.softmax(-1), dropout_p)
+    return att @ v
+
+
+def block_sparse_attention(q, k, v, key_index, block_mask, dropout_p=0.0):
+    """
+    Attention of q (B, H, T, D) over k and v (B, H, S, D) restricted to a layout
+    from `get_block_sparse_mask`.
+    """
+    B, H, T, D = q.shape
+    query_blocks, block_size, _ = block_mask.shape
+    q = F.pad(q, (0, 0, 0, query_blocks * block_size - T)).view(B, H, query_blocks, block_size, D)
+    k, v = [F.pad(x, (0, 0, 0, -x.shape[2] % block_size))[:, :, key_index] for x in (k, v)]
+    x = _sdpa(q, k, v, block_mask, dropout_p)
+    return x.view(B, H, query_blocks * block_size, D)[:, :, :T]
+
+
+def fused_attention(attn, query, key, attn_mask=None):
+    """
+    Multi-head attention of `query` over `key` (also used as value) with the weights of
+    `attn`, an `nn.MultiheadAttention` or a `MultiheadAttention`. `attn_mask` is either a
+    mask with the `nn.MultiheadAttention` conventions or a `get_block_sparse_mask` layout.
+    """
+    if not attn.batch_first:
+        query, key = query.transpose(0, 1), key.transpose(0, 1)
+    B, T, C = query.shape
+    heads = attn.num_heads
+
+    if isinstance(attn, nn.MultiheadAttention):
+        assert attn._qkv_same_embed_dim and attn.bias_k is None and not attn.add_zero_attn
+        weight, bias = attn.in_proj_weight, attn.in_proj_bias
+        if query is key:
+            q, k, v = F.linear(query, weight, bias).chunk(3, -1)
+        else:
+            q = F.linear(query, weight[:C], None if bias is None else bias[:C])
+            k, v = F.linear(key, weight[C:], None if bias is None else bias[C:]).chunk(2, -1)
+        dropout_p = attn.dropout
+        out_proj = attn.out_proj
+    else:
+        q, k, v = attn.q(query), attn.k(key), attn.v(key)
+        dropout_p = attn.attn_drop.p
+        out_proj = lambda x: attn.proj_drop(attn.proj(x))
+
+    q, k, v = [x.reshape(B, -1, heads, C // heads).transpose(1, 2) for x in (q, k, v)]
+    dropout_p = dropout_p if attn.training else 0.0
+
+    if isinstance(attn_mask, tuple):
+        x = block_sparse_attention(q, k, v, *attn_mask, dropout_p=dropout_p)
+    else:
+        if attn_mask is not None and attn_mask.dtype == torch.bool:
+            attn_mask = ~attn_mask
+        x = _sdpa(q, k, v, attn_mask, dropout_p)
+
+    x = out_proj(x.transpose(1, 2).reshape(B, T, C))
+    if not attn.batch_first:
+        x = x.transpose(0, 1)
+    return x
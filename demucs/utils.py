@@ -5,6 +5,7 @@
 # LICENSE file in the root directory of this source tree.
 
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 import math
 import os
@@ -229,7 +230,68 @@ def tensor_chunk(tensor_or_chunk):
         return TensorChunk(tensor_or_chunk)
 
 
-def apply_model_v1(model, mix, shifts=None, split=False, progress=False, set_progress_bar=None):
+def constant_cache(func):
+    """
+    Memoizes `func`, which must return tensors that only depend on its arguments (sizes,
+    devices, dtypes), so that inference over many segments builds them only once.
+    The returned tensors are shared between calls and must not be modified in place.
+    """
+    cached = functools.lru_cache(maxsize=64)(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Tensors created in inference mode can't be used with autograd later on.
+        with th.inference_mode(False):
+            return cached(*args, **kwargs)
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+@constant_cache
+def arange(end, device):
+    return th.arange(end, device=device)
+
+
+@functools.lru_cache(maxsize=None)
+def overlap_window(segment, transition_power, device):
+    """
+    Triangle shaped weight, with maximal weight in the middle of the segment, normalized
+    and taken to the power `transition_power`. Large values of transition power will lead
+    to sharper transitions. If the overlap < 50%, this will translate to linear transition
+    when transition_power is 1.
+    """
+    weight = th.cat([th.arange(1, segment // 2 + 1, device=device),
+                     th.arange(segment - segment // 2, 0, -1, device=device)])
+    assert len(weight) == segment
+    return (weight / weight.max())**transition_power
+
+
+class OverlapAdd:
+    """
+    Weighted overlap-add of chunk predictions into a buffer of `shape`, the last dimension
+    being time. The chunks are given up front as (offset, length) pairs, so the normalization
+    is known before the first chunk arrives and every chunk is added in place already
+    normalized. `dtype` can be set to float16 or bfloat16 to halve the buffer memory.
+    """
+    def __init__(self, shape, chunks, segment, transition_power=1., device=None, dtype=None):
+        self.out = th.zeros(*shape, device=device, dtype=dtype or th.float32)
+        self.weight = overlap_window(segment, transition_power, self.out.device)
+        self.sum_weight = th.zeros(shape[-1], device=self.out.device)
+        for offset, length in chunks:
+            self.sum_weight[offset:offset + length] += self.weight[:length]
+
+    def add(self, chunk_out, offset):
+        length = chunk_out.shape[-1]
+        target = self.out[..., offset:offset + length]
+        scale = self.weight[:length] / self.sum_weight[offset:offset + length]
+        target.addcmul_(chunk_out.to(target), scale.to(target))
+
+    def result(self):
+        return self.out.float()
+
+
+def apply_model_v1(model, mix, shifts=None, split=False, progress=False, set_progress_bar=None, accumulation_dtype=None):
     """
     Apply model to a given mixture.
 
@@ -242,6 +304,7 @@ def apply_model_v1(model, mix, shifts=None, split=False, progress=False, set_pro
             and predictions will be performed individually on each and concatenated.
             Useful for model with large memory footprint like Tasnet.
         progress (bool): if True, show a progress bar (requires split=True)
+        accumulation_dtype (torch.dtype or None): dtype of the split mode output buffer.
     """
 
     channels, length = mix.size()
@@ -249,9 +312,10 @@ def apply_model_v1(model, mix, shifts=None, split=False, progress=False, set_pro
     progress_value = 0
     
     if split:
-        out = th.zeros(4, channels, length, device=device)
         shift = model.samplerate * 10
         offsets = range(0, length, shift)
+        # Chunks do not overlap, so every chunk is copied with a normalized weight of 1.
+        out = OverlapAdd((4, channels, length), [(offset, min(shift, length - offset)) for offset in offsets], shift, device=device, dtype=accumulation_dtype)
         scale = 10
         if progress:
             offsets = tqdm.tqdm(offsets, unit_scale=scale, ncols=120, unit='seconds')
@@ -263,9 +327,9 @@ def apply_model_v1(model, mix, shifts=None, split=False, progress=False, set_pro
                 chunk_out = apply_model_v1(model, chunk, shifts=shifts, set_progress_bar=set_progress_bar)
             else:
                 chunk_out = apply_model_v1(model, chunk, shifts=shifts)
-            out[..., offset:offset + shift] = chunk_out
+            out.add(chunk_out, offset)
             offset += shift
-        return out
+        return out.result()
     elif shifts:
         max_shift = int(model.samplerate / 2)
         mix = F.pad(mix, (max_shift, max_shift))
@@ -290,7 +354,8 @@ def apply_model_v1(model, mix, shifts=None, split=False, progress=False, set_pro
         return center_trim(out, mix)
 
 def apply_model_v2(model, mix, shifts=None, split=False,
-                overlap=0.25, transition_power=1., progress=False, set_progress_bar=None): 
+                overlap=0.25, transition_power=1., progress=False, set_progress_bar=None, batch_shifts=False,
+                accumulation_dtype=None): 
     """
     Apply model to a given mixture.
 
@@ -303,6 +368,9 @@ def apply_model_v2(model, mix, shifts=None, split=False,
             and predictions will be performed individually on each and concatenated.
             Useful for model with large memory footprint like Tasnet.
         progress (bool): if True, show a progress bar (requires split=True)
+        batch_shifts (bool): if True, all shifted copies of a chunk are cut to the same
+            length and passed through the model as one batch.
+        accumulation_dtype (torch.dtype or None): dtype of the split mode overlap-add buffer.
     """
     
     assert transition_power >= 1, "transition_power < 1 leads to weird behavior."
@@ -311,37 +379,37 @@ def apply_model_v2(model, mix, shifts=None, split=False,
     progress_value = 0
     
     if split:
-        out = th.zeros(len(model.sources), channels, length, device=device)
-        sum_weight = th.zeros(length, device=device)
         segment = model.segment_length
         stride = int((1 - overlap) * segment)
         offsets = range(0, length, stride)
+        out = OverlapAdd((len(model.sources), channels, length), [(offset, min(segment, length - offset)) for offset in offsets],
+                         segment, transition_power, device, accumulation_dtype)
         scale = stride / model.samplerate
         if progress:
             offsets = tqdm.tqdm(offsets, unit_scale=scale, ncols=120, unit='seconds')
-        # We start from a triangle shaped weight, with maximal weight in the middle
-        # of the segment. Then we normalize and take to the power `transition_power`.
-        # Large values of transition power will lead to sharper transitions.
-        weight = th.cat([th.arange(1, segment // 2 + 1),
-                         th.arange(segment - segment // 2, 0, -1)]).to(device)
-        assert len(weight) == segment
-        # If the overlap < 50%, this will translate to linear transition when
-        # transition_power is 1.
-        weight = (weight / weight.max())**transition_power
         for offset in offsets:
             chunk = TensorChunk(mix, offset, segment)
             if set_progress_bar:
                 progress_value += 1
                 set_progress_bar(0.1, (0.8/len(offsets)*progress_value))
-                chunk_out = apply_model_v2(model, chunk, shifts=shifts, set_progress_bar=set_progress_bar)
+                chunk_out = apply_model_v2(model, chunk, shifts=shifts, set_progress_bar=set_progress_bar, batch_shifts=batch_shifts)
             else:
-                chunk_out = apply_model_v2(model, chunk, shifts=shifts)
-            chunk_length = chunk_out.shape[-1]
-            out[..., offset:offset + segment] += weight[:chunk_length] * chunk_out
-            sum_weight[offset:offset + segment] += weight[:chunk_length]
+                chunk_out = apply_model_v2(model, chunk, shifts=shifts, batch_shifts=batch_shifts)
+            out.add(chunk_out, offset)
             offset += segment
-        assert sum_weight.min() > 0
-        out /= sum_weight
+        assert out.sum_weight.min() > 0
+        return out.result()
+    elif shifts and batch_shifts:
+        max_shift = int(0.5 * model.samplerate)
+        mix = tensor_chunk(mix)
+        padded_mix = mix.padded(length + 2 * max_shift)
+        offsets = [random.randint(0, max_shift) for _ in range(shifts)]
+        valid_length = model.valid_length(length + max_shift)
+        shifted = th.stack([TensorChunk(padded_mix, offset, length + max_shift).padded(valid_length) for offset in offsets])
+        with th.no_grad():
+            shifted_out = center_trim(model(shifted), length + max_shift)
+        out = sum(shifted_out[k, ..., max_shift - offset:max_shift - offset + length] for k, offset in enumerate(offsets))
+        out /= shifts
         return out
     elif shifts:
         max_shift = int(0.5 * model.samplerate)
@@ -500,3 +568,24 @@ class DummyPoolExecutor:
 
     def __exit__(self, exc_type, exc_value, exc_tb):
         return
+
+
+@contextmanager
+def cpu_pool(workers, threads):
+    """
+    Thread pool that shares `threads` torch threads equally between `workers`.
+    Each worker forks its own OpenMP team, so the workers run side by side.
+    """
+    num_threads = th.get_num_threads()
+    if workers <= 1 and threads == num_threads:
+        yield DummyPoolExecutor()
+        return
+
+    worker_threads = max(threads // workers, 1)
+    th.set_num_threads(worker_threads)
+    pool = ThreadPoolExecutor(workers, initializer=th.set_num_threads, initargs=(worker_threads,))
+    try:
+        yield pool
+    finally:
+        pool.shutdown()
+        th.set_num_threads(num_threads)
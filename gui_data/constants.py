@@ -211,6 +211,29 @@ STEM_PAIR_MAPPER = {
 
 MDX_NET_FREQ_CUT = [VOCAL_STEM, INST_STEM]
 
+MDX_SESSION_POOL_SIZE = 4
+MDX_SESSION_POOL_MEMORY = 4 << 30
+DEMUCS_MODEL_POOL_SIZE = 2
+DEMUCS_MODEL_POOL_MEMORY = 2 << 30
+VR_BAND_CACHE_SIZE = 32
+VR_BAND_CACHE_MEMORY = 2 << 30
+MDX_STREAM_CHUNKS = 30
+
+MDX_SESSION_DEFAULT = 'Default'
+MDX_SESSION_PARALLEL = 'Parallel'
+MDX_SESSION_LOW_CPU = 'Low CPU'
+
+MDX_PRECISION_FP32 = 'FP32'
+MDX_PRECISION_FP16 = 'FP16'
+MDX_PRECISION_INT8 = 'INT8'
+
+MDX_PRECISIONS = (MDX_PRECISION_FP32, MDX_PRECISION_FP16, MDX_PRECISION_INT8)
+
+MDX_SESSION_PROFILES = {
+            MDX_SESSION_DEFAULT: {'intra_op_threads': 0, 'inter_op_threads': 0, 'optimization_level': 'all', 'is_parallel': False},
+            MDX_SESSION_PARALLEL: {'intra_op_threads': 0, 'inter_op_threads': 0, 'optimization_level': 'all', 'is_parallel': True},
+            MDX_SESSION_LOW_CPU: {'intra_op_threads': 1, 'inter_op_threads': 1, 'optimization_level': 'extended', 'is_parallel': False}}
+
 DEMUCS_4_STEM_OPTIONS = (ALL_STEMS, VOCAL_STEM, OTHER_STEM, BASS_STEM, DRUM_STEM)
 DEMUCS_6_STEM_OPTIONS = (ALL_STEMS, VOCAL_STEM, OTHER_STEM, BASS_STEM, DRUM_STEM, GUITAR_STEM, PIANO_STEM)
 DEMUCS_2_STEM_OPTIONS = (VOCAL_STEM, INST_STEM)
@@ -269,7 +292,7 @@ MANUAL_ENSEMBLE_OPTIONS = (MIN_SPEC, MAX_SPEC, AUDIO_AVERAGE)
 
 PROCESS_METHODS = (VR_ARCH_PM, MDX_ARCH_TYPE, DEMUCS_ARCH_TYPE, ENSEMBLE_MODE, AUDIO_TOOLS)
 
-DEMUCS_SEGMENTS = ('Default', '1', '5', '10', '15', '20', 
+DEMUCS_SEGMENTS = ('Default', AUTO_SELECT, '1', '5', '10', '15', '20', 
                   '25', '30', '35', '40', '45', '50', 
                   '55', '60', '65', '70', '75', '80', 
                   '85', '90', '95', '100')
@@ -281,6 +304,17 @@ DEMUCS_SHIFTS = (0, 1, 2, 3, 4, 5,
 
 DEMUCS_OVERLAP = (0.25, 0.50, 0.75, 0.99)
 
+DEMUCS_SEGMENT_BATCHES = (AUTO_SELECT, '1', '2', '4', '8')
+DEMUCS_CPU_WORKERS = (AUTO_SELECT, '1', '2', '4', '8')
+DEMUCS_CPU_THREADS = (AUTO_SELECT, '2', '4', '8', '16', '32', '64')
+DEMUCS_ATTENTION_NATIVE = 'Native'
+DEMUCS_ATTENTION_SDPA = 'SDPA'
+DEMUCS_ATTENTION_BACKENDS = {DEMUCS_ATTENTION_NATIVE: 'native', DEMUCS_ATTENTION_SDPA: 'sdpa'}
+DEMUCS_BACKEND_PYTORCH = 'PyTorch'
+DEMUCS_BACKEND_ONNX = 'ONNX Runtime'
+DEMUCS_BACKEND_TORCHSCRIPT = 'TorchScript'
+DEMUCS_BACKENDS = {DEMUCS_BACKEND_PYTORCH: None, DEMUCS_BACKEND_ONNX: 'onnx', DEMUCS_BACKEND_TORCHSCRIPT: 'torchscript'}
+
 VR_AGGRESSION = (1, 2, 3, 4, 5, 
                  6, 7, 8, 9, 10, 11, 
                  12, 13, 14, 15, 16, 17, 
@@ -288,7 +322,15 @@ VR_AGGRESSION = (1, 2, 3, 4, 5,
 
 VR_WINDOW = ('320', '512','1024')
 VR_CROP = ('256', '512', '1024')
-VR_BATCH = ('4', '6', '8')
+VR_BATCH = ('4', '6', '8', AUTO_SELECT)
+MDX_BATCH = ('1', '2', '4', '8', '16')
+AUTO_MEMORY_BUDGETS = ('25%', '50%', '75%', '90%')
+AUTOTUNE_VR_BATCHES = (1, 2, 4, 6, 8, 12, 16)
+VR_STREAM_CHUNKS = 30
+VR_STREAM_MARGIN = 44100*2
+VR_STREAM_CROSSFADE = 4410
+AUTOTUNE_SEGMENT_BATCHES = (1, 2, 4, 8)
+AUTOTUNE_CPU_WORKERS = (1, 2, 4, 8)
 POST_PROCESSES_THREASHOLD_VALUES = ('0.1', '0.2', '0.3')
 
 MDX_POP_PRO = ('MDX-NET_Noise_Profile_14_kHz', 'MDX-NET_Noise_Profile_17_kHz', 'MDX-NET_Noise_Profile_Full_Band')
@@ -359,10 +401,11 @@ REG_COMPENSATION = r'\b^(1[0]|[0-9]([.][0-9]*)?|Auto|None)$\b'
 REG_THES_POSTPORCESS = r'\b^([0]([.][0-9]{0,6})?)$\b'
 REG_CHUNKS = r'\b^(200|1[0-9][0-9]|[1-9][0-9]?|Auto|Full)$\b'
 REG_MARGIN = r'\b^[0-9]*$\b'
-REG_SEGMENTS = r'\b^(200|1[0-9][0-9]|[1-9][0-9]?|Default)$\b'
+REG_SEGMENTS = r'\b^(200|1[0-9][0-9]|[1-9][0-9]?|Default|Auto)$\b'
 REG_SAVE_INPUT = r'\b^([a-zA-Z0-9 -]{0,25})$\b'
 REG_AGGRESSION = r'^[-+]?[0-9]\d*?$'
 REG_WINDOW = r'\b^[0-9]{0,4}$\b'
+REG_BATCHES = r'\b^([0-9]{0,4}|Auto)$\b'
 REG_SHIFTS = r'\b^[0-9]*$\b'
 REG_OVERLAP = r'\b^([0]([.][0-9]{0,6})?|None)$\b'
 
@@ -433,6 +476,7 @@ DEFAULT_DATA = {
         'is_post_process': False,
         'is_high_end_process': False,
         'post_process_threshold': 0.2,
+        'is_vr_streaming': False,
         'vr_voc_inst_secondary_model': NO_MODEL,
         'vr_other_secondary_model': NO_MODEL,
         'vr_bass_secondary_model': NO_MODEL,
@@ -446,6 +490,11 @@ DEFAULT_DATA = {
         'demucs_stems': ALL_STEMS,
         'segment': DEMUCS_SEGMENTS[0],
         'overlap': DEMUCS_OVERLAP[0],
+        'segment_batch': DEMUCS_SEGMENT_BATCHES[0],
+        'demucs_cpu_workers': DEMUCS_CPU_WORKERS[0],
+        'demucs_cpu_threads': DEMUCS_CPU_THREADS[0],
+        'demucs_attention': DEMUCS_ATTENTION_NATIVE,
+        'demucs_backend': DEMUCS_BACKEND_PYTORCH,
         'shifts': 2,
         'chunks_demucs': CHUNKS[0],
         'margin_demucs': 44100,
@@ -454,6 +503,8 @@ DEFAULT_DATA = {
         'is_secondary_stem_only_Demucs': False,
         'is_split_mode': True,
         'is_demucs_combine_stems': True,
+        'is_demucs_batch_shifts': False,
+        'is_demucs_concurrent_models': False,
         'demucs_voc_inst_secondary_model': NO_MODEL,
         'demucs_other_secondary_model': NO_MODEL,
         'demucs_bass_secondary_model': NO_MODEL,
@@ -473,6 +524,10 @@ DEFAULT_DATA = {
         'compensate': AUTO_SELECT,
         'is_denoise': False,
         'is_invert_spec': False, 
+        'mdx_batch_size': MDX_BATCH[2],
+        'mdx_session_profile': MDX_SESSION_DEFAULT,
+        'mdx_precision': MDX_PRECISION_FP32,
+        'is_mdx_streaming': False,
         'mdx_voc_inst_secondary_model': NO_MODEL,
         'mdx_other_secondary_model': NO_MODEL,
         'mdx_bass_secondary_model': NO_MODEL,
@@ -508,7 +563,8 @@ DEFAULT_DATA = {
         'model_hash_table': None,
         'help_hints_var': False,
         'model_sample_mode': False,
-        'model_sample_mode_duration': 30
+        'model_sample_mode_duration': 30,
+        'auto_memory_budget': AUTO_MEMORY_BUDGETS[1]
 }
 
 SETTING_CHECK = ('vr_model',
@@ -521,6 +577,7 @@ SETTING_CHECK = ('vr_model',
                'is_post_process',
                'is_high_end_process',
                'post_process_threshold',
+               'is_vr_streaming',
                'vr_voc_inst_secondary_model',
                'vr_other_secondary_model',
                'vr_bass_secondary_model',
@@ -533,6 +590,11 @@ SETTING_CHECK = ('vr_model',
                'demucs_model',
                'segment',
                'overlap',
+               'segment_batch',
+               'demucs_cpu_workers',
+               'demucs_cpu_threads',
+               'demucs_attention',
+               'demucs_backend',
                'shifts',
                'chunks_demucs',
                'margin_demucs',
@@ -541,6 +603,8 @@ SETTING_CHECK = ('vr_model',
                'is_secondary_stem_only_Demucs',
                'is_split_mode',
                'is_demucs_combine_stems',
+               'is_demucs_batch_shifts',
+               'is_demucs_concurrent_models',
                'demucs_voc_inst_secondary_model',
                'demucs_other_secondary_model',
                'demucs_bass_secondary_model',
@@ -557,6 +621,10 @@ SETTING_CHECK = ('vr_model',
                'compensate',
                'is_denoise',
                'is_invert_spec',
+               'mdx_batch_size',
+               'mdx_session_profile',
+               'mdx_precision',
+               'is_mdx_streaming',
                'mdx_voc_inst_secondary_model',
                'mdx_other_secondary_model',
                'mdx_bass_secondary_model',
@@ -587,7 +655,8 @@ SETTING_CHECK = ('vr_model',
                'is_normalization',
                'help_hints_var',
                'model_sample_mode',
-               'model_sample_mode_duration')
+               'model_sample_mode_duration',
+               'auto_memory_budget')
 
 # Message Box Text
 
@@ -612,7 +681,7 @@ SAVE_CURRENT_SETTINGS_HELP = 'Allows the user to open any saved settings or save
 CHUNKS_HELP = ('This option allows the user to reduce (or increase) RAM or V-RAM usage.\n\n' + \
                 '• Smaller chunk sizes use less RAM or V-RAM but can also increase processing times.\n' + \
                 '• Larger chunk sizes use more RAM or V-RAM but can also reduce processing times.\n' + \
-                '• Selecting \"Auto\" calculates an appropriate chuck size based on how much RAM or V-RAM your system has.\n' + \
+                '• Selecting \"Auto\" measures the model\'s memory use on a short probe and picks the fastest chunk size that fits the Auto Memory Budget.\n' + \
                 '• Selecting \"Full\" will process the track as one whole chunk.\n' + \
                 '• This option is only recommended for those with powerful PCs.\n' +\
                 '• The default selection is \"Auto\".')
@@ -638,6 +707,7 @@ SEGMENT_HELP = ('This option allows the user to reduce (or increase) RAM or V-RA
                 '• Smaller segment sizes use less RAM or V-RAM but can also increase processing times.\n' + \
                 '• Larger segment sizes use more RAM or V-RAM but can also reduce processing times.\n' + \
                 '• Selecting \"Default\" uses the recommended segment size.\n' + \
+                '• Selecting \"Auto\" picks the largest segment size that fits the Auto Memory Budget.\n' + \
                 '• It is recommended that you not use segments with \"Chunking\".')
 ENSEMBLE_MAIN_STEM_HELP = 'Allows the user to select the type of stems they wish to ensemble.\n\nOptions:\n\n' +\
                           f'• {VOCAL_PAIR} - The primary stem will be the vocals and the secondary stem will be the the instrumental\n' +\
@@ -659,26 +729,70 @@ IS_GPU_CONVERSION_HELP = ('When checked, the application will attempt to use you
                          'Note: CPU conversions are much slower than those processed through the GPU.')
 SAVE_STEM_ONLY_HELP = 'Allows the user to save only the selected stem.'
 IS_NORMALIZATION_HELP = 'Normalizes output to prevent clipping.'
+AUTO_MEMORY_BUDGET_HELP = ('Sets how much of the currently free RAM or V-RAM the \"Auto\" chunk, segment and batch size options may use.\n\n' + \
+                           '• The memory use of each model is measured once and saved with the model data.\n' + \
+                           '• Lower this value when other applications or conversions share the computer.')
 CROP_SIZE_HELP = '**Only compatible with select models only!**\n\n Setting should match training crop-size value. Leave as is if unsure.'
-BATCH_SIZE_HELP = '**Only compatible with select models only!**\n\n Lower values allows for less resource usage but longer conversion times.'
+BATCH_SIZE_HELP = 'Sets how many windows are sent to the VR model at once.\n\n Lower values allows for less resource usage but longer conversion times.\n\n Selecting \"Auto\" picks the fastest batch size that fits the Auto Memory Budget.'
 IS_TTA_HELP = ('This option performs Test-Time-Augmentation to improve the separation quality.\n\n' +\
                'Note: Having this selected will increase the time it takes to complete a conversion')
 IS_POST_PROCESS_HELP = ('This option can potentially identify leftover instrumental artifacts within the vocal outputs. \nThis option may improve the separation of some songs.\n\n' +\
                        'Note: Selecting this option can adversely affect the conversion process, depending on the track. Because of this, it is only recommended as a last resort.')
 IS_HIGH_END_PROCESS_HELP = 'The application will mirror the missing frequency range of the output.'
+IS_VR_STREAMING_HELP = ('Separates the input in overlapping blocks and writes the outputs block by block instead of holding the whole track in memory.\n\n' + \
+                        '• Recommended for very long recordings.\n' + \
+                        '• Only used for single model conversions of WAV, FLAC or other inputs at 44100 Hz without a secondary model.')
 SHIFTS_HELP = ('Performs multiple predictions with random shifts of the input and averages them.\n\n' +\
               '• The higher number of shifts, the longer the prediction will take. \n- Not recommended unless you have a GPU.')
 OVERLAP_HELP = 'This option controls the amount of overlap between prediction windows (for Demucs one window is 10 seconds)'
+SEGMENT_BATCH_HELP = ('The number of segments passed through the model at once when \"Split Mode\" is enabled.\n\n' + \
+                      '• Higher values keep more CPU cores or GPU busy but use more RAM or V-RAM.\n' + \
+                      '• Selecting \"Auto\" picks the fastest batch that fits the Auto Memory Budget.')
+DEMUCS_CPU_WORKERS_HELP = ('The number of segments processed side by side during CPU conversions with \"Split Mode\" enabled.\n\n' + \
+                           '• The CPU threads are shared equally between the workers.\n' + \
+                           '• Selecting \"Auto\" times each worker count once per model and picks the fastest.')
+DEMUCS_CPU_THREADS_HELP = ('The total number of CPU threads used by the CPU workers.\n\n' + \
+                           '• Selecting \"Auto\" uses all available threads.')
+DEMUCS_ATTENTION_HELP = ('Selects how the transformer layers of the Demucs v4 models compute attention.\n\n' + \
+                         f'• {DEMUCS_ATTENTION_NATIVE} - Uses the attention layers the models were trained with.\n' + \
+                         f'• {DEMUCS_ATTENTION_SDPA} - Uses fused scaled dot-product attention, usually faster and lighter on memory.\n' + \
+                         '• Selecting \"Auto\" times the ones usable with the loaded model once and picks the fastest.')
+DEMUCS_BACKEND_HELP = ('Selects what runs the Demucs v3/v4 models.\n\n' + \
+                       f'• {DEMUCS_BACKEND_PYTORCH} - Runs the models in PyTorch.\n' + \
+                       f'• {DEMUCS_BACKEND_ONNX}/{DEMUCS_BACKEND_TORCHSCRIPT} - Runs the models from static exports made with\n' + \
+                       '   \"python -m lib_v5.demucs_export\" for the segment in use, and falls back to PyTorch without them.')
 IS_CHUNK_DEMUCS_HELP = '• Enables the using \"Chunks\".\n• We recommend you not enable this option with \"Split Mode\" enabled or with the Demucs v4 Models.'
 IS_SPLIT_MODE_HELP = ('• Enables \"Segments\". \n• We recommend you not enable this option with \"Enable Chunks\".\n' +\
                       '• Deselecting this option is only recommended for those with powerful PCs or if using \"Chunk\" mode instead.')
+IS_DEMUCS_BATCH_SHIFTS_HELP = ('Runs all \"Shifts\" together instead of one after another.\n\n' + \
+                               '• The shifted predictions are batched with the segments and blended in a single pass.\n' + \
+                               '• Uses more RAM or V-RAM and gives very slightly different results.')
+IS_DEMUCS_CONCURRENT_MODELS_HELP = ('Runs the models of a multi-model Demucs (e.g. htdemucs_ft) side by side during CPU conversions.\n\n' + \
+                                    '• The CPU threads are shared equally between the models.\n' + \
+                                    '• Uses more RAM since every model processes the track at the same time.')
 IS_DEMUCS_COMBINE_STEMS_HELP = 'The application will create the secondary stem by combining the remaining stems \ninstead of inverting the primary stem with the mixture.'
 COMPENSATE_HELP = 'Compensates the audio of the primary stems to allow for a better secondary stem.'
+MDX_BATCH_SIZE_HELP = ('Sets how many chunk windows are sent to the MDX-Net model at once.\n\n' + \
+                       '• Smaller batch sizes use less RAM or V-RAM.\n' + \
+                       '• Larger batch sizes can reduce processing times but use more RAM or V-RAM.')
+MDX_SESSION_PROFILE_HELP = ('Selects how ONNX Runtime schedules the MDX-Net model on the CPU.\n\n' + \
+                            f'• {MDX_SESSION_DEFAULT} - Uses all cores for each operator and full graph optimizations.\n' + \
+                            f'• {MDX_SESSION_PARALLEL} - Also runs independent operators in parallel.\n' + \
+                            f'• {MDX_SESSION_LOW_CPU} - Uses a single thread. Useful when several conversions share one machine.\n\n' + \
+                            'The optimized model is saved to the model data folder so later loads are faster.')
+MDX_PRECISION_HELP = ('Selects a converted copy of the MDX-Net model.\n\n' + \
+                      f'• {MDX_PRECISION_FP32} - The original model.\n' + \
+                      f'• {MDX_PRECISION_FP16} - Half precision. Faster on supported GPUs.\n' + \
+                      f'• {MDX_PRECISION_INT8} - Quantized weights. Faster on CPUs with a small loss in quality.\n\n' + \
+                      'Converted models are created with "python -m lib_v5.mdx_convert". If no converted copy exists the original model is used.')
 IS_DENOISE_HELP = '• This option removes a majority of the noise generated by the MDX-Net models.\n• The conversion will take nearly twice as long with this enabled.'
 CLEAR_CACHE_HELP = 'Clears any user selected model settings for previously unrecognized models.'
 IS_SAVE_ALL_OUTPUTS_ENSEMBLE_HELP = 'Enabling this option will keep all indivudual outputs generated by an ensemble.'
 IS_APPEND_ENSEMBLE_NAME_HELP = 'The application will append the ensemble name to the final output \nwhen this option is enabled.'
 DONATE_HELP = 'Takes the user to an external web-site to donate to this project!'
+IS_MDX_STREAMING_HELP = ('Reads the input and writes the outputs chunk by chunk instead of holding the whole track in memory.\n\n' + \
+                         '• Recommended for very long recordings.\n' + \
+                         '• Only used for single model conversions of WAV, FLAC or other inputs at 44100 Hz without a secondary model.')
 IS_INVERT_SPEC_HELP = '• This option may produce a better secondary stem.\n• Inverts primary stem with mixture using spectragrams instead of wavforms.\n• This inversion method is slightly slower.'
 IS_TESTING_AUDIO_HELP = 'Appends a unique 10 digit number to output files so the user \ncan compare results with different settings.'
 IS_MODEL_TESTING_AUDIO_HELP = 'Appends the model name to output files so the user \ncan compare results with different settings.'
@@ -775,6 +889,10 @@ SAVING_STEM = 'Saving ', ' stem...'
 SAVING_ALL_STEMS = 'Saving all stems...'
 ENSEMBLING_OUTPUTS = 'Ensembling outputs...'
 DONE = ' Done!\n'
+CPU_WORKERS_SPEEDUP = lambda w, t, s:f'CPU workers: {w} x {t} threads ({s:.2f}x faster than 1 worker)\n'
+DEMUCS_EXPORT_MISSING = lambda b:f'No {b} export of this model for the current segment, running it in PyTorch.\n'
+ATTENTION_BACKEND_TIMES = lambda b, times:f'Attention backend: {b} (' + ', '.join(f"{n}: {t:.2f}s" for n, t in times.items()) + ')\n'
+BAG_MODEL_TIMES = lambda times:'Model run times: ' + ', '.join(f'{n + 1}: {t:.1f}s' for n, t in enumerate(times)) + '\n'
 ENSEMBLES_SAVED = 'Ensembled outputs saved!\n\n'
 NEW_LINES = "\n\n"
 NEW_LINE = "\n"
@@ -0,0 +1,187 @@
+"""
+Measurement based sizing for chunks, segments and batches.
+
+A short probe runs the loaded model on two workload sizes and records the peak
+memory and run time of each. The linear fit of those measurements is cached per
+model, so later runs only have to compare it against the memory that is free at
+that moment.
+"""
+
+import json
+import os
+import threading
+import time
+import psutil
+import torch
+
+class PeakMemory():
+    """Records the peak memory use of the process (CPU) or the device (CUDA) above `baseline`, by default the level at entry"""
+
+    def __init__(self, device, baseline=None, interval=0.005):
+        self.device = torch.device(device)
+        self.baseline = baseline
+        self.is_cuda = self.device.type == 'cuda'
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start = self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def read(self):
+        if self.is_cuda:
+            free, total = torch.cuda.mem_get_info(self.device)
+            return total - free
+
+        return self.process.memory_info().rss
+
+    def sample(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak = max(self.peak, self.read())
+
+    def __enter__(self):
+        if self.is_cuda:
+            torch.cuda.synchronize(self.device)
+            torch.cuda.reset_peak_memory_stats(self.device)
+            self.allocated = torch.cuda.memory_allocated(self.device)
+
+        self.peak = self.read()
+        self.start = self.peak if self.baseline is None else self.baseline
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        if self.is_cuda:
+            torch.cuda.synchronize(self.device)
+
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.read())
+
+        if self.is_cuda:
+            self.peak = max(self.peak, self.start + torch.cuda.max_memory_allocated(self.device) - self.allocated)
+
+    @property
+    def usage(self):
+        return max(self.peak - self.start, 0)
+
+def available_memory(device):
+    """Memory that can still be claimed on the device, including what PyTorch has cached but not allocated"""
+
+    device = torch.device(device)
+
+    if device.type == 'cuda':
+        free, _ = torch.cuda.mem_get_info(device)
+        return free + torch.cuda.memory_reserved(device) - torch.cuda.memory_allocated(device)
+
+    return psutil.virtual_memory().available
+
+def device_tag(device):
+    device = torch.device(device)
+    return torch.cuda.get_device_name(device).replace(' ', '_') if device.type == 'cuda' else device.type
+
+class AutoTuner():
+    """
+    Picks the setting value with the highest throughput whose estimated peak memory fits in
+    `memory_budget` (a fraction of the memory available when the setting is tuned).
+    """
+
+    def __init__(self, cache_dir, model_key, memory_budget=0.5):
+        self.cache_path = os.path.join(cache_dir, f'{model_key}_autotune.json')
+        self.memory_budget = memory_budget
+
+    def load_cache(self):
+        if os.path.isfile(self.cache_path):
+            try:
+                with open(self.cache_path) as f:
+                    return json.load(f)
+            except ValueError:
+                pass
+
+        return {}
+
+    def save_cache(self, key, result):
+        cache = self.load_cache()
+        cache[key] = result
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+
+        with open(self.cache_path, 'w') as f:
+            f.write(json.dumps(cache, indent=4))
+
+    def measure(self, probe, probe_sizes, device):
+        measurements = []
+
+        # Allocator arenas keep what an earlier probe claimed, so every probe is
+        # measured against the level before the first one. The warm-up run keeps
+        # one-off initialisation out of the timings.
+        baseline = PeakMemory(device).read()
+        probe(probe_sizes[0])
+
+        for size in probe_sizes:
+            with PeakMemory(device, baseline) as peak_memory:
+                start_time = time.perf_counter()
+                probe(size)
+                run_time = time.perf_counter() - start_time
+            measurements.append((size, peak_memory.usage, run_time))
+
+        (x1, m1, t1), (x2, m2, t2) = measurements[0], measurements[-1]
+        memory_slope, time_slope = max((m2 - m1) / (x2 - x1), 0), max((t2 - t1) / (x2 - x1), 0)
+
+        return {'memory': [max(m2 - memory_slope * x2, 0), memory_slope],
+                'time': [max(t2 - time_slope * x2, 0), time_slope]}
+
+    def tune(self, setting, probe, probe_sizes, candidates, device, is_largest=False, is_cached=True):
+        """
+        Returns the best entry of `candidates`. `probe(size)` must run the model on a workload of
+        `size` in the units of the candidates (seconds of audio, batch items, ...). With
+        `is_largest` the largest value that fits is returned regardless of throughput, for
+        settings where larger values also improve quality.
+        """
+
+        key = f'{setting}_{device_tag(device)}'
+        result = self.load_cache().get(key) if is_cached else None
+
+        if not result:
+            result = self.measure(probe, probe_sizes, device)
+            self.save_cache(key, result)
+
+        memory_base, memory_slope = result['memory']
+        time_base, time_slope = result['time']
+        budget = available_memory(device) * self.memory_budget
+
+        feasible = [x for x in candidates if memory_base + memory_slope * x <= budget]
+
+        if not feasible:
+            return min(candidates)
+
+        if is_largest:
+            return max(feasible)
+
+        throughput = lambda x:x / max(time_base + time_slope * x, 1e-9)
+        best = max(throughput(x) for x in feasible)
+
+        # Prefer the smallest value that is within 2% of the best throughput, the
+        # extra memory of larger values buys nothing once the curve flattens.
+        return min(x for x in feasible if throughput(x) >= best * 0.98)
+
+    def compare(self, setting, run, candidates, device, is_cached=True):
+        """
+        Times `run(candidate)` for each candidate after a warm-up run and returns the run times
+        by candidate, for settings that change the speed but not the size of the workload.
+        """
+
+        key = f'{setting}_{device_tag(device)}'
+        times = self.load_cache().get(key, {}) if is_cached else {}
+        missing = [x for x in candidates if str(x) not in times]
+
+        if missing:
+            run(missing[0])
+
+            for x in missing:
+                start_time = time.perf_counter()
+                run(x)
+                times[str(x)] = time.perf_counter() - start_time
+
+            self.save_cache(key, times)
+
+        return {x: times[str(x)] for x in candidates}
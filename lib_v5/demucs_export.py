@@ -0,0 +1,100 @@
+"""
+Offline export of Demucs v3/v4 models for the ONNX Runtime and TorchScript backends.
+
+Exports the network part of every model of a Demucs bag for a fixed segment,
+checks the exported models against PyTorch on a reference clip and prints a
+speed/accuracy comparison. Artifacts that exceed the tolerance are removed, so
+UVR keeps running those models in PyTorch.
+
+Usage:
+    python -m lib_v5.demucs_export [model_name ...] [--format onnx torchscript] [--segment 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+from pathlib import Path
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from demucs.export import EXPORT_FORMATS, export_length, export_model, get_exportable_models, get_export_path, load_exported_core
+from demucs.pretrained import get_model
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMUCS_NEWER_REPO_DIR = os.path.join(BASE_PATH, 'models', 'Demucs_Models', 'v3_v4_repo')
+
+def load_model(model_name, segment=None):
+    model = get_model(name=model_name, repo=Path(DEMUCS_NEWER_REPO_DIR))
+    models = get_exportable_models(model)
+
+    for sub_model in models:
+        sub_model.eval()
+        if segment:
+            sub_model.segment = segment
+
+    return models
+
+def time_model(model, mix):
+    with torch.no_grad():
+        model(mix[:1])
+        start_time = time.perf_counter()
+        output = model(mix)
+        return output, time.perf_counter() - start_time
+
+def validate_model(model, core, batch_size=2):
+    """Compares the full forward pass of `model` with and without the exported network part"""
+
+    mix = torch.randn(batch_size, model.audio_channels, core.length, generator=torch.Generator().manual_seed(0)) * 0.1
+    model.exported_core = None
+    reference, reference_time = time_model(model, mix)
+    model.exported_core = core
+
+    try:
+        output, run_time = time_model(model, mix)
+    finally:
+        model.exported_core = None
+
+    error = (output - reference).abs().max().item() / max(reference.abs().max().item(), 1e-8)
+    return error, reference_time, run_time
+
+def main():
+    parser = argparse.ArgumentParser(description='Export Demucs v3/v4 models to ONNX or TorchScript and check them against PyTorch.')
+    parser.add_argument('models', nargs='*', help='model names (.yaml) in the Demucs v3/v4 models folder (default: all)')
+    parser.add_argument('--format', nargs='+', choices=list(EXPORT_FORMATS), default=['onnx'])
+    parser.add_argument('--segment', type=int, help='segment in seconds, as set in the Segments option (default: the model segment)')
+    parser.add_argument('--tolerance', type=float, default=1e-3, help='largest error allowed, relative to the peak of the PyTorch output')
+    args = parser.parse_args()
+
+    # the shape checks of the models are fixed by the static export, as intended.
+    warnings.filterwarnings('ignore', category=torch.jit.TracerWarning)
+
+    model_names = args.models or [os.path.splitext(x)[0] for x in os.listdir(DEMUCS_NEWER_REPO_DIR) if x.endswith('.yaml')]
+
+    for model_name in model_names:
+        model_path = os.path.join(DEMUCS_NEWER_REPO_DIR, f'{model_name}.yaml')
+
+        try:
+            models = load_model(model_name, args.segment)
+        except AssertionError as e:
+            print(f'Skipping {model_name}: {e}')
+            continue
+
+        print(f'\n{model_name}')
+
+        for export_format in args.format:
+            for index, model in enumerate(models):
+                length = export_length(model)
+                export_path = get_export_path(model_path, index, length, export_format)
+                export_model(model, export_path, export_format, length)
+                error, reference_time, run_time = validate_model(model, load_exported_core(export_path, length, export_format))
+                is_valid = error <= args.tolerance
+                print(f'  {export_format:<12}model {index}   {run_time:6.2f}s   speedup {reference_time/run_time:5.2f}x   max error {error:.2e}   {"ok" if is_valid else "removed"}')
+
+                if not is_valid:
+                    os.remove(export_path)
+
+if __name__ == '__main__':
+    main()
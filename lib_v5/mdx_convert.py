@@ -0,0 +1,157 @@
+"""
+Offline precision conversion for MDX-Net models.
+
+Creates dynamically quantized INT8 (and optionally FP16) copies of the .onnx
+models in the MDX-Net model folder, registers the copies under their own
+model hash so UVR can load them with the same parameters as the source model,
+and prints a speed/accuracy comparison against the FP32 model.
+
+Usage:
+    python -m lib_v5.mdx_convert [model_name ...] [--precision int8 fp16] [--clip reference.wav]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import onnxruntime as ort
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gui_data.constants import *
+from lib_v5.model_hash import get_model_hash
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MDX_MODELS_DIR = os.path.join(BASE_PATH, 'models', 'MDX_Net_Models')
+MDX_HASH_DIR = os.path.join(MDX_MODELS_DIR, 'model_data')
+MDX_HASH_JSON = os.path.join(MDX_HASH_DIR, 'model_data.json')
+MDX_CONVERTED_DIR = os.path.join(MDX_MODELS_DIR, 'converted')
+
+SAMPLE_RATE = 44100
+HOP = 1024
+
+def get_model_data(model_hash):
+    model_settings_json = os.path.join(MDX_HASH_DIR, f'{model_hash}.json')
+
+    if os.path.isfile(model_settings_json):
+        with open(model_settings_json) as f:
+            return json.load(f)
+
+    if os.path.isfile(MDX_HASH_JSON):
+        with open(MDX_HASH_JSON) as f:
+            for hash, settings in json.load(f).items():
+                if model_hash in hash:
+                    return settings
+
+    return None
+
+def register_model_data(model_path, model_data):
+    """Stores the source model's parameters under the converted model's hash"""
+
+    with open(os.path.join(MDX_HASH_DIR, f'{get_model_hash(model_path)}.json'), 'w') as outfile:
+        outfile.write(json.dumps(model_data, indent=4))
+
+def get_converted_model_path(model_path, precision):
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(MDX_CONVERTED_DIR, f'{model_name}_{precision.lower()}{ONNX}')
+
+def convert_model(model_path, precision):
+    converted_model_path = get_converted_model_path(model_path, precision)
+    os.makedirs(MDX_CONVERTED_DIR, exist_ok=True)
+
+    if precision == MDX_PRECISION_INT8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, converted_model_path, weight_type=QuantType.QUInt8)
+    elif precision == MDX_PRECISION_FP16:
+        import onnx
+        from onnxruntime.transformers.float16 import convert_float_to_float16
+        model = convert_float_to_float16(onnx.load(model_path), keep_io_types=True)
+        onnx.save(model, converted_model_path)
+    else:
+        raise ValueError(f'Unsupported precision: {precision}')
+
+    return converted_model_path
+
+def load_reference_clip(clip_path, seconds=30):
+    if clip_path:
+        import librosa
+        mix, _ = librosa.load(clip_path, mono=False, sr=SAMPLE_RATE, duration=seconds)
+        if mix.ndim == 1:
+            mix = np.asfortranarray([mix, mix])
+    else:
+        mix = np.random.default_rng(0).standard_normal((2, SAMPLE_RATE*seconds)).astype(np.float32) * 0.1
+
+    return mix.astype(np.float32)
+
+def get_reference_specs(mix, model_data, batch_size=4):
+    """Frames the clip the same way SeperateMDX does and returns model input batches"""
+
+    dim_f, dim_t, n_fft = model_data['mdx_dim_f_set'], 2**model_data['mdx_dim_t_set'], model_data['mdx_n_fft_scale_set']
+    chunk_size = HOP * (dim_t-1)
+    window = np.hanning(n_fft).astype(np.float32)
+    pad = (-mix.shape[-1]) % chunk_size
+    mix = np.pad(mix, ((0, 0), (0, pad)))
+
+    frames = mix.reshape(2, -1, chunk_size).transpose(1, 0, 2)
+    frames = np.pad(frames, ((0, 0), (0, 0), (n_fft//2, n_fft//2)), mode='reflect')
+    index = np.arange(dim_t)[:, None] * HOP + np.arange(n_fft)[None, :]
+    spec = np.fft.rfft(frames[:, :, index] * window, axis=-1)[..., :dim_f].transpose(0, 1, 3, 2)
+    spec = np.stack([spec.real, spec.imag], axis=2).reshape(-1, 4, dim_f, dim_t).astype(np.float32)
+
+    return [spec[i:i+batch_size] for i in range(0, len(spec), batch_size)]
+
+def run_session(model_path, specs, providers):
+    session = ort.InferenceSession(model_path, providers=providers)
+    session.run(None, {session.get_inputs()[0].name: specs[0]})
+
+    start_time = time.perf_counter()
+    outputs = [session.run(None, {session.get_inputs()[0].name: spec})[0] for spec in specs]
+
+    return np.concatenate(outputs), time.perf_counter() - start_time
+
+def compare_models(model_path, converted_model_paths, specs, providers):
+    reference, reference_time = run_session(model_path, specs, providers)
+    print(f'\n{os.path.basename(model_path)}')
+    print(f'  {MDX_PRECISION_FP32:<6}{reference_time:8.2f}s   speedup  1.00x')
+
+    for precision, converted_model_path in converted_model_paths.items():
+        output, run_time = run_session(converted_model_path, specs, providers)
+        error = output - reference
+        snr = 10 * np.log10(np.sum(reference**2) / max(np.sum(error**2), 1e-20))
+        print(f'  {precision:<6}{run_time:8.2f}s   speedup {reference_time/run_time:5.2f}x   SNR {snr:6.1f} dB   max error {np.abs(error).max():.2e}')
+
+def main():
+    is_cuda = 'CUDAExecutionProvider' in ort.get_available_providers()
+    default_precisions = [MDX_PRECISION_INT8, MDX_PRECISION_FP16] if is_cuda else [MDX_PRECISION_INT8]
+
+    parser = argparse.ArgumentParser(description='Convert MDX-Net models to INT8/FP16 and compare them with the FP32 originals.')
+    parser.add_argument('models', nargs='*', help='model names in the MDX-Net models folder (default: all)')
+    parser.add_argument('--precision', nargs='+', type=str.upper, choices=MDX_PRECISIONS[1:], default=default_precisions,
+                        help='FP16 only pays off on GPUs, so it is skipped by default when CUDA is unavailable')
+    parser.add_argument('--clip', help='reference audio used for the comparison (default: white noise)')
+    parser.add_argument('--seconds', type=int, default=30, help='length of the reference clip')
+    args = parser.parse_args()
+
+    model_names = args.models or [os.path.splitext(x)[0] for x in os.listdir(MDX_MODELS_DIR) if x.endswith(ONNX)]
+    providers = ['CUDAExecutionProvider'] if is_cuda else ['CPUExecutionProvider']
+    mix = load_reference_clip(args.clip, args.seconds)
+
+    for model_name in model_names:
+        model_path = os.path.join(MDX_MODELS_DIR, f'{model_name}{ONNX}')
+        model_data = get_model_data(get_model_hash(model_path))
+
+        if not model_data:
+            print(f'Skipping {model_name}: no model parameters found, run it once in UVR first.')
+            continue
+
+        converted_model_paths = {}
+        for precision in args.precision:
+            converted_model_paths[precision] = convert_model(model_path, precision)
+            register_model_data(converted_model_paths[precision], model_data)
+
+        compare_models(model_path, converted_model_paths, get_reference_specs(mix, model_data), providers)
+
+if __name__ == '__main__':
+    main()
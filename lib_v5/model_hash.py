@@ -0,0 +1,11 @@
+import hashlib
+
+def get_model_hash(model_path):
+    """Hash used to look up model parameters (md5 of the last 10MB, or of the whole file if it is smaller)"""
+
+    with open(model_path, 'rb') as f:
+        try:
+            f.seek(- 10000 * 1024, 2)
+        except OSError:
+            f.seek(0)
+        return hashlib.md5(f.read()).hexdigest()
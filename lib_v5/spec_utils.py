@@ -95,16 +95,18 @@ def wave_to_spectrogram_mt(wave, hop_length, n_fft, mid_side=False, mid_side_b2=
         wave_left = np.asfortranarray(wave[0])
         wave_right = np.asfortranarray(wave[1])
    
+    # The left channel is kept local to the call, so several bands can be transformed at once.
+    spec_left = {}
+
     def run_thread(**kwargs):
-        global spec_left
-        spec_left = librosa.stft(**kwargs)
+        spec_left['spec'] = librosa.stft(**kwargs)
 
     thread = threading.Thread(target=run_thread, kwargs={'y': wave_left, 'n_fft': n_fft, 'hop_length': hop_length})
     thread.start()
     spec_right = librosa.stft(wave_right, n_fft, hop_length=hop_length)
     thread.join()   
     
-    spec = np.asfortranarray([spec_left, spec_right])
+    spec = np.asfortranarray([spec_left['spec'], spec_right])
 
     return spec
     
@@ -325,7 +327,7 @@ def cmb_spectrogram_to_wave(spec_m, mp, extra_bins_h=None, extra_bins=None):
 
     for d in range(1, bands_n + 1):
         bp = mp.param['band'][d]
-        spec_s = np.ndarray(shape=(2, bp['n_fft'] // 2 + 1, spec_m.shape[2]), dtype=complex)
+        spec_s = np.zeros(shape=(2, bp['n_fft'] // 2 + 1, spec_m.shape[2]), dtype=complex)
         h = bp['crop_stop'] - bp['crop_start']
         spec_s[:, bp['crop_start']:bp['crop_stop'], :] = spec_m[:, offset:offset+h, :]
         
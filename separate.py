@@ -1,12 +1,18 @@
 from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING
-from demucs.apply import apply_model, demucs_segments
-from demucs.hdemucs import HDemucs
+from demucs.apply import BagOfModels, apply_model, demucs_segments
+from demucs.export import attach_exported_cores
+from demucs.htdemucs import HTDemucs
+from demucs.transformer import CrossTransformerEncoder, get_attention_backends, set_attention_backend
 from demucs.model_v2 import auto_load_demucs_model_v2
 from demucs.pretrained import get_model as _gm
 from demucs.utils import apply_model_v1
 from demucs.utils import apply_model_v2
+from demucs.utils import cpu_pool
 from lib_v5 import spec_utils
+from lib_v5.autotune import AutoTuner
 from lib_v5.vr_network import nets
 from lib_v5.vr_network import nets_new
 #from lib_v5.vr_network.model_param_init import ModelParameters
@@ -30,6 +36,169 @@ if TYPE_CHECKING:
 warnings.filterwarnings("ignore")
 cpu = torch.device('cpu')
 
+class OnnxSessionPool:
+    """Keeps warm ONNX Runtime sessions between files, evicting the least
+    recently used ones once the size limit or memory budget is exceeded."""
+
+    def __init__(self, max_sessions=MDX_SESSION_POOL_SIZE, memory_budget=MDX_SESSION_POOL_MEMORY):
+        self.max_sessions = max_sessions
+        self.memory_budget = memory_budget
+        self.sessions = OrderedDict()
+
+    def get_session(self, model_path, providers, sess_options=None):
+        key = (model_path, os.path.getmtime(model_path), tuple(providers), session_options_key(sess_options))
+
+        if key in self.sessions:
+            self.sessions.move_to_end(key)
+            return self.sessions[key][0]
+
+        session = ort.InferenceSession(model_path, sess_options=sess_options, providers=providers)
+        self.sessions[key] = (session, os.path.getsize(model_path))
+        self.evict()
+
+        return session
+
+    def memory_usage(self):
+        return sum(size for _, size in self.sessions.values())
+
+    def evict(self):
+        while len(self.sessions) > 1 and (len(self.sessions) > self.max_sessions or self.memory_usage() > self.memory_budget):
+            self.sessions.popitem(last=False)
+
+    def clear(self):
+        self.sessions.clear()
+
+def session_options_key(sess_options):
+    if sess_options is None:
+        return None
+
+    return (sess_options.intra_op_num_threads,
+            sess_options.inter_op_num_threads,
+            sess_options.graph_optimization_level,
+            sess_options.execution_mode,
+            sess_options.optimized_model_filepath)
+
+def get_saved_optimization_level(profile):
+    """Level of the optimized graphs saved to disk. The layout changes of 'all' depend on the
+    CPU or GPU they were made on, so a saved graph is optimized at 'extended' at most."""
+
+    return 'extended' if profile['optimization_level'] == 'all' else profile['optimization_level']
+
+def get_session_options(profile, is_optimized_model=False):
+    optimization_levels = {'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+                           'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+                           'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL}
+
+    sess_options = ort.SessionOptions()
+    sess_options.intra_op_num_threads = profile['intra_op_threads']
+    sess_options.inter_op_num_threads = profile['inter_op_threads']
+    sess_options.execution_mode = ort.ExecutionMode.ORT_PARALLEL if profile['is_parallel'] else ort.ExecutionMode.ORT_SEQUENTIAL
+
+    # A saved graph only lacks the hardware specific optimizations of 'all', which run when it is loaded.
+    if is_optimized_model:
+        sess_options.graph_optimization_level = optimization_levels['all'] if profile['optimization_level'] == 'all' else ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    else:
+        sess_options.graph_optimization_level = optimization_levels[profile['optimization_level']]
+
+    return sess_options
+
+onnx_session_pool = OnnxSessionPool()
+
+class DemucsModelPool:
+    """Keeps loaded Demucs v3/v4 models on the CPU between files, evicting the least
+    recently used ones once the size limit or memory budget is exceeded."""
+
+    def __init__(self, max_models=DEMUCS_MODEL_POOL_SIZE, memory_budget=DEMUCS_MODEL_POOL_MEMORY):
+        self.max_models = max_models
+        self.memory_budget = memory_budget
+        self.models = OrderedDict()
+
+    def get_model(self, model_path):
+        key = (model_path, os.path.getmtime(model_path))
+
+        if key in self.models:
+            self.models.move_to_end(key)
+            model, segments = self.models[key]
+        else:
+            model = _gm(name=os.path.splitext(os.path.basename(model_path))[0], repo=Path(os.path.dirname(model_path)))
+            segments = [sub_model.segment for sub_model in get_sub_models(model)]
+            self.models[key] = (model, segments)
+            self.evict()
+
+        # Segments are changed per file by the Segments option and its auto tuning.
+        for sub_model, segment in zip(get_sub_models(model), segments):
+            sub_model.segment = segment
+
+        return model
+
+    def release(self, model):
+        """Moves a model back to the CPU once a file is done, so pooled models hold no
+        GPU memory and clear_gpu_cache can free it between files."""
+
+        model.cpu()
+
+        for sub_model in get_sub_models(model):
+            if getattr(sub_model, 'exported_core', None) is not None and sub_model.exported_core.device.type != 'cpu':
+                sub_model.exported_core = None
+
+    def memory_usage(self):
+        return sum(sum(t.numel() * t.element_size() for t in [*model.parameters(), *model.buffers()]) for model, _ in self.models.values())
+
+    def evict(self):
+        while len(self.models) > 1 and (len(self.models) > self.max_models or self.memory_usage() > self.memory_budget):
+            self.models.popitem(last=False)
+
+    def clear(self):
+        self.models.clear()
+
+def get_sub_models(model):
+    return model.models if isinstance(model, BagOfModels) else [model]
+
+demucs_model_pool = DemucsModelPool()
+
+class VRBandCache:
+    """Keeps the band waves and spectrograms of the current input between VR models, evicting
+    the least recently used ones once the size limit or memory budget is exceeded."""
+
+    def __init__(self, max_bands=VR_BAND_CACHE_SIZE, memory_budget=VR_BAND_CACHE_MEMORY):
+        self.max_bands = max_bands
+        self.memory_budget = memory_budget
+        self.bands = OrderedDict()
+
+    def get(self, key):
+        if key in self.bands:
+            self.bands.move_to_end(key)
+            return self.bands[key]
+
+        return None
+
+    def put(self, key, band):
+        # Bands of other files are never read again once the next file starts.
+        for other_key in [k for k in self.bands if k[0] != key[0]]:
+            del self.bands[other_key]
+
+        if band.nbytes <= self.memory_budget:
+            self.bands[key] = band
+            self.evict()
+
+    def memory_usage(self):
+        return sum(band.nbytes for band in self.bands.values())
+
+    def evict(self):
+        while self.bands and (len(self.bands) > self.max_bands or self.memory_usage() > self.memory_budget):
+            self.bands.popitem(last=False)
+
+    def clear(self):
+        self.bands.clear()
+
+def get_file_key(audio_file):
+    """Identifies the contents of an input file by its path, size and modification time"""
+
+    stat = os.stat(audio_file)
+    return (os.path.abspath(audio_file), stat.st_size, stat.st_mtime_ns)
+
+vr_band_cache = VRBandCache()
+
 class SeperateAttributes:
     def __init__(self, model_data: ModelData, process_data: dict, main_model_primary_stem_4_stem=None, main_process_method=None):
         
@@ -69,6 +238,7 @@ class SeperateAttributes:
         self.is_invert_spec = model_data.is_invert_spec #
         self.secondary_model_scale = model_data.secondary_model_scale #
         self.is_demucs_pre_proc_model_inst_mix = model_data.is_demucs_pre_proc_model_inst_mix #
+        self.autotuner = AutoTuner(model_data.autotune_cache_dir, model_data.model_hash or self.model_basename, model_data.auto_memory_budget)
         self.primary_source_map = {}
         self.secondary_source_map = {}
         self.primary_source = None
@@ -101,6 +271,11 @@ class SeperateAttributes:
             self.n_fft = model_data.mdx_n_fft_scale_set
             self.chunks = model_data.chunks
             self.margin = model_data.margin
+            self.mdx_batch_size = model_data.mdx_batch_size
+            self.mdx_session_profile = MDX_SESSION_PROFILES.get(model_data.mdx_session_profile, MDX_SESSION_PROFILES[MDX_SESSION_DEFAULT])
+            self.mdx_model_cache_dir = model_data.mdx_model_cache_dir
+            self.is_mdx_streaming = model_data.is_mdx_streaming
+            self.model_hash = model_data.model_hash
             self.hop = 1024
             self.n_bins = self.n_fft//2+1
             self.chunk_size = self.hop * (self.dim_t-1)
@@ -108,6 +283,7 @@ class SeperateAttributes:
             self.dim_c = 4
             out_c = self.dim_c
             self.freq_pad = torch.zeros([1, out_c, self.n_bins-self.dim_f, self.dim_t]).to(cpu)
+            self.io_buffers = None
         
         if model_data.process_method == DEMUCS_ARCH_TYPE:
             self.demucs_stems = model_data.demucs_stems if not main_process_method in [MDX_ARCH_TYPE, VR_ARCH_TYPE] else None
@@ -117,10 +293,20 @@ class SeperateAttributes:
             self.secondary_stem = model_data.ensemble_secondary_stem if process_data['is_ensemble_master'] else model_data.secondary_stem
             self.is_chunk_demucs = model_data.is_chunk_demucs
             self.segment = model_data.segment
+            self.segment_batch = model_data.segment_batch
+            self.demucs_cpu_workers = model_data.demucs_cpu_workers
+            self.demucs_cpu_threads = model_data.demucs_cpu_threads
+            self.cpu_workers_speedup = None
+            self.demucs_attention = model_data.demucs_attention
+            self.attention_times = None
+            self.demucs_backend = model_data.demucs_backend
             self.demucs_version = model_data.demucs_version
             self.demucs_source_list = model_data.demucs_source_list
             self.demucs_source_map = model_data.demucs_source_map
             self.is_demucs_combine_stems = model_data.is_demucs_combine_stems
+            self.is_demucs_batch_shifts = model_data.is_demucs_batch_shifts
+            self.is_demucs_concurrent_models = model_data.is_demucs_concurrent_models
+            self.model_times = None
             self.demucs_stem_count = model_data.demucs_stem_count
             self.pre_proc_model = model_data.pre_proc_model
             
@@ -156,6 +342,7 @@ class SeperateAttributes:
             self.window_size = model_data.window_size
             self.input_high_end_h = None
             self.post_process_threshold = model_data.post_process_threshold
+            self.is_vr_streaming = model_data.is_vr_streaming
             self.aggressiveness = {'value': model_data.aggression_setting, 
                                    'split_bin': self.mp.param['band'][1]['crop_stop'], 
                                    'aggr_correction': self.mp.param.get('aggr_correction')}
@@ -180,6 +367,30 @@ class SeperateAttributes:
         else:
             self.write_to_console(INFERENCE_STEP_1)
         
+    def autotune(self, setting, probe, probe_sizes, candidates, device, is_largest=False):
+        # Probes run the real inference path, keep them off the progress bar.
+        set_progress_bar, progress_value = self.set_progress_bar, self.progress_value
+        self.set_progress_bar = lambda *args, **kwargs:None
+
+        try:
+            return self.autotuner.tune(setting, probe, probe_sizes, candidates, device, is_largest=is_largest)
+        finally:
+            self.set_progress_bar, self.progress_value = set_progress_bar, progress_value
+
+    def autotune_chunks(self, setting, demix, probe_sizes, device):
+        """Picks a chunk length in seconds, 0 (Full) when the whole track fits"""
+
+        duration = get_duration(self.audio_file)
+        candidates = [int(chunk) for chunk in CHUNKS if chunk.isdigit()]
+        probe = lambda seconds:demix({0: np.random.default_rng(0).uniform(-0.1, 0.1, (2, int(44100*seconds))).astype(np.float32)})
+
+        if duration:
+            candidates = [chunk for chunk in candidates if chunk < duration] + [duration]
+
+        chunks = self.autotune(setting, probe, probe_sizes, candidates, device)
+
+        return 0 if chunks == duration else chunks
+
     def load_cached_sources(self, is_4_stem_demucs=False):
         
         if self.is_secondary_model and not self.is_pre_proc_model:
@@ -222,6 +433,48 @@ class SeperateAttributes:
             self.write_to_console(DONE, base_text='')
             self.set_progress_bar(0.95)
 
+    def is_streaming_mix(self, is_streaming):
+        if not is_streaming or self.is_secondary_model or self.is_secondary_model_activated or self.is_ensemble_mode:
+            return False
+
+        try:
+            return sf.info(self.audio_file).samplerate == 44100
+        except Exception:
+            return False
+
+    def open_stream_writers(self):
+        """Returns the output paths of the stems to save, the paths written while streaming and open soundfile writers for them"""
+
+        stem_paths = {}
+        subtype = 'FLOAT' if self.is_normalization else self.wav_type_set
+
+        if not self.is_secondary_stem_only:
+            stem_paths[self.primary_stem] = os.path.join(self.export_path, f'{self.audio_file_base}_({self.primary_stem}).wav')
+        if not self.is_primary_stem_only:
+            stem_paths[self.secondary_stem] = os.path.join(self.export_path, f'{self.audio_file_base}_({self.secondary_stem}).wav')
+
+        # With normalization the peak is only known at the end, so the stems are
+        # written as float first and rescaled in a second streaming pass.
+        write_paths = {stem: f'{os.path.splitext(path)[0]}_tmp.wav' if self.is_normalization else path for stem, path in stem_paths.items()}
+        writers = {stem: sf.SoundFile(path, 'w', samplerate=44100, channels=2, subtype=subtype) for stem, path in write_paths.items()}
+
+        return stem_paths, write_paths, writers
+
+    def save_streamed_stems(self, stem_paths, write_paths, peaks, blocksize):
+        for stem, stem_path in stem_paths.items():
+            self.write_to_console(f'{SAVING_STEM[0]}{stem}{SAVING_STEM[1]}')
+
+            if self.is_normalization:
+                scale = 1/peaks[stem] if peaks[stem] > 1.0 else 1
+                with sf.SoundFile(write_paths[stem]) as source_file, sf.SoundFile(stem_path, 'w', samplerate=44100, channels=2, subtype=self.wav_type_set) as stem_file:
+                    for block in source_file.blocks(blocksize=blocksize, dtype='float32'):
+                        stem_file.write(block*scale)
+                os.remove(write_paths[stem])
+
+            save_format(stem_path, self.save_format, self.mp3_bit_set)
+            self.write_to_console(DONE, base_text='')
+            self.set_progress_bar(0.95)
+
 class SeperateMDX(SeperateAttributes):        
 
     def seperate(self):
@@ -240,13 +493,28 @@ class SeperateMDX(SeperateAttributes):
                 self.device = torch.device('cpu')
                 run_type = ['CPUExecutionProvider']
 
-            self.onnx_model = ort.InferenceSession(self.model_path, providers=run_type)
+            self.onnx_model = self.load_onnx_model(run_type)
+
+            if self.chunks == AUTO_SELECT:
+                chunk_seconds = self.chunk_size/44100
+                self.chunks = self.autotune_chunks(f'chunks_{self.mdx_batch_size}_{int(self.is_denoise)}', self.demix_base, (chunk_seconds, chunk_seconds*3), self.device)
 
             self.running_inference()
             mdx_net_cut = True if self.primary_stem in MDX_NET_FREQ_CUT else False
-            mix, raw_mix, samplerate = prepare_mix(self.audio_file, self.chunks, self.margin, mdx_net_cut=mdx_net_cut)
+
+            if self.is_streaming_mix(self.is_mdx_streaming):
+                self.demix_streaming(mdx_net_cut)
+                torch.cuda.empty_cache()
+                return
+
+            mix, raw_mix, samplerate = prepare_mix(self.audio_file, self.chunks, self.margin)
             
-            source = self.demix_base(mix)
+            # The band-limited mix for the inversion comes from the inference STFT frames.
+            if mdx_net_cut and not self.is_primary_stem_only:
+                source, raw_mix = self.demix_base(mix, is_return_match_mix=True)
+                raw_mix = raw_mix[0]
+            else:
+                source = self.demix_base(mix)
             self.write_to_console(DONE, base_text='')            
 
         if self.is_secondary_model_activated:
@@ -265,7 +533,6 @@ class SeperateMDX(SeperateAttributes):
             self.write_to_console(f'{SAVING_STEM[0]}{self.secondary_stem}{SAVING_STEM[1]}') if not self.is_secondary_model else None
             secondary_stem_path = os.path.join(self.export_path, f'{self.audio_file_base}_({self.secondary_stem}).wav')
             if not isinstance(self.secondary_source, np.ndarray):
-                raw_mix = self.demix_base(raw_mix, is_match_mix=True)[0] if mdx_net_cut else raw_mix
                 self.secondary_source, raw_mix = spec_utils.normalize_two_stem(source[0]*self.compensate, raw_mix, self.is_normalization)
             
                 if self.is_invert_spec:
@@ -285,54 +552,188 @@ class SeperateMDX(SeperateAttributes):
         if self.is_secondary_model:
             return secondary_sources
 
-    def demix_base(self, mix, is_match_mix=False):
+    def load_onnx_model(self, run_type):
+        # The first load writes ORT's optimized graph next to the model data so
+        # later loads, including ones from freshly started processes, can skip
+        # most of the graph optimization. Only the session that is kept goes
+        # into the pool, always under the key of the optimized graph.
+        if not self.model_hash:
+            return onnx_session_pool.get_session(self.model_path, run_type, get_session_options(self.mdx_session_profile))
+
+        saved_profile = {**self.mdx_session_profile, 'optimization_level': get_saved_optimization_level(self.mdx_session_profile)}
+        provider_tag = run_type[0].replace('ExecutionProvider', '').lower()
+        optimized_model_path = os.path.join(self.mdx_model_cache_dir, f'{self.model_hash}_{saved_profile["optimization_level"]}_{provider_tag}{ONNX}')
+
+        if not os.path.isfile(optimized_model_path):
+            sess_options = get_session_options(saved_profile)
+            temp_model_path = f'{optimized_model_path}.tmp'
+            sess_options.optimized_model_filepath = temp_model_path
+
+            try:
+                ort.InferenceSession(self.model_path, sess_options=sess_options, providers=run_type)
+                os.replace(temp_model_path, optimized_model_path)
+            except Exception as e:
+                self.write_to_console(f'\nUnable to cache the optimized model: {e}\n', base_text='')
+                return onnx_session_pool.get_session(self.model_path, run_type, get_session_options(self.mdx_session_profile))
+
+        sess_options = get_session_options(self.mdx_session_profile, is_optimized_model=True)
+        return onnx_session_pool.get_session(optimized_model_path, run_type, sess_options)
+
+    def demix_base(self, mix, is_return_match_mix=False):
         chunked_sources = []
+        chunked_match_mix = []
 
         for slice in mix:
             self.progress_value += 1
-            self.set_progress_bar(0.1, (0.8/len(mix)*self.progress_value)) if not is_match_mix else None
-            cmix = mix[slice]
+            self.set_progress_bar(0.1, (0.8/len(mix)*self.progress_value))
             sources = []
-            mix_waves = []
-            n_sample = cmix.shape[1]
-            trim = self.n_fft//2
-            gen_size = self.chunk_size-2*trim
-            pad = gen_size - n_sample%gen_size
-            mix_p = np.concatenate((np.zeros((2,trim)), cmix, np.zeros((2,pad)), np.zeros((2,trim))), 1)
-            i = 0
-            while i < n_sample + pad:
-                waves = np.array(mix_p[:, i:i+self.chunk_size])
-                mix_waves.append(waves)
-                i += gen_size
-            mix_waves = torch.tensor(mix_waves, dtype=torch.float32).to(cpu)
-            with torch.no_grad():
-                _ort = self.onnx_model if not is_match_mix else None
-                adjust = 1
-                spek = self.stft(mix_waves)*adjust
-                
-                if not is_match_mix:
-                    if self.is_denoise:
-                        spec_pred = -_ort.run(None, {'input': -spek.cpu().numpy()})[0]*0.5+_ort.run(None, {'input': spek.cpu().numpy()})[0]*0.5
-                    else:
-                        spec_pred = _ort.run(None, {'input': spek.cpu().numpy()})[0]
-                else:
-                    spec_pred = spek.cpu().numpy()
-
-                tar_waves = self.istft(torch.tensor(spec_pred))#.cpu()
-                tar_signal = tar_waves[:,:,trim:-trim].transpose(0,1).reshape(2, -1).numpy()[:, :-pad]
-                start = 0 if slice == 0 else self.margin
-                end = None if slice == list(mix.keys())[::-1][0] else -self.margin
-                if self.margin == 0:
-                    end = None
-                sources.append(tar_signal[:,start:end]*(1/adjust))
+            adjust = 1
+            tar_signal, match_signal = self.demix_chunk(mix[slice], is_return_match_mix=is_return_match_mix)
+            start = 0 if slice == 0 else self.margin
+            end = None if slice == list(mix.keys())[::-1][0] else -self.margin
+            if self.margin == 0:
+                end = None
+            sources.append(tar_signal[:,start:end]*(1/adjust))
             chunked_sources.append(sources)
+            if is_return_match_mix:
+                chunked_match_mix.append([match_signal[:,start:end]])
         sources = np.concatenate(chunked_sources, axis=-1)
 
-        if not is_match_mix:
-            del self.onnx_model
+        if is_return_match_mix:
+            return sources, np.concatenate(chunked_match_mix, axis=-1)
 
         return sources
-    
+
+    def demix_chunk(self, cmix, is_return_match_mix=False):
+        """Returns the model output for one chunk and, if asked for, the chunk with the bins above dim_f removed"""
+
+        n_sample = cmix.shape[1]
+        trim = self.n_fft//2
+        gen_size = self.chunk_size-2*trim
+        pad = gen_size - n_sample%gen_size
+        mix_p = np.zeros((2, trim+n_sample+pad+trim), dtype=np.float32)
+        mix_p[:, trim:trim+n_sample] = cmix
+        mix_waves = frame_mix(mix_p, self.chunk_size, gen_size)
+        to_signal = lambda waves:waves[:,:,trim:-trim].transpose(0,1).reshape(2, -1).numpy()[:, :-pad]
+        with torch.no_grad():
+            tar_waves, match_waves = self.run_batches(mix_waves, is_return_match_mix=is_return_match_mix)
+            tar_signal = to_signal(tar_waves)
+            match_signal = to_signal(match_waves) if is_return_match_mix else None
+
+        return tar_signal, match_signal
+
+    def demix_streaming(self, mdx_net_cut):
+        """
+        Separates the input block by block and appends both stems to open soundfile writers,
+        so memory use depends on the chunk size instead of the track length.
+        """
+
+        peaks = {}
+        is_primary, is_secondary = not self.is_secondary_stem_only, not self.is_primary_stem_only
+        chunk_set = self.chunks if self.chunks else MDX_STREAM_CHUNKS
+        stem_paths, write_paths, writers = self.open_stream_writers()
+
+        try:
+            with sf.SoundFile(self.audio_file) as audio:
+                chunk_bounds = get_chunk_bounds(audio.frames, chunk_set, self.margin)
+                for skip, start, end in chunk_bounds:
+                    self.progress_value += 1
+                    self.set_progress_bar(0.1, (0.8/len(chunk_bounds)*self.progress_value))
+                    audio.seek(start)
+                    cmix = audio.read(end-start, dtype='float32', always_2d=True).T
+                    cmix = np.asfortranarray([cmix[0], cmix[0]]) if cmix.shape[0] == 1 else cmix
+                    trim = slice(skip-start, None if end == audio.frames else skip-start+chunk_set*44100)
+                    source, match_mix = self.demix_chunk(cmix, is_return_match_mix=mdx_net_cut and is_secondary)
+
+                    if is_primary:
+                        peaks[self.primary_stem] = max(peaks.get(self.primary_stem, 0), np.abs(source[:, trim]).max())
+                        writers[self.primary_stem].write(source[:, trim].T)
+
+                    if is_secondary:
+                        raw_mix = match_mix if mdx_net_cut else cmix
+                        source = source*self.compensate
+                        peaks[self.secondary_stem] = max(peaks.get(self.secondary_stem, 0), np.abs(source[:, trim]).max())
+
+                        if self.is_invert_spec:
+                            secondary_source = spec_utils.invert_stem(raw_mix, source)
+                        else:
+                            secondary_source = (-source.T+raw_mix.T)
+
+                        writers[self.secondary_stem].write(secondary_source[trim])
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        self.write_to_console(DONE, base_text='')
+        self.save_streamed_stems(stem_paths, write_paths, peaks, chunk_set*44100)
+
+    def run_batches(self, mix_waves, is_return_match_mix=False):
+        # The STFT of the next batch and the iSTFT of the previous batch run
+        # in worker threads while the current batch is inside the ONNX session.
+        # The match mix is the iSTFT of the unprocessed input spectrogram, which
+        # only keeps the bins below dim_f.
+        batches = torch.split(mix_waves, max(1, self.mdx_batch_size))
+        tar_waves = []
+        match_waves = []
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            spek_future = pool.submit(self.stft, batches[0])
+            istft_future = None
+            for i in range(len(batches)):
+                spek = spek_future.result()
+                if i + 1 < len(batches):
+                    spek_future = pool.submit(self.stft, batches[i + 1])
+
+                if is_return_match_mix:
+                    match_waves.append(pool.submit(self.istft, spek))
+
+                spec_pred = self.run_model(spek, i % 2)
+
+                if istft_future:
+                    tar_waves.append(istft_future.result())
+                istft_future = pool.submit(self.istft, spec_pred)
+            tar_waves.append(istft_future.result())
+
+        match_waves = torch.cat([future.result() for future in match_waves]) if is_return_match_mix else None
+
+        return torch.cat(tar_waves), match_waves
+
+    def run_model(self, spek, buffer_index=0):
+        # Inputs and outputs are bound straight to reusable torch buffers, so the
+        # session reads and writes the memory the STFT/iSTFT work on. Two output
+        # buffers alternate because the iSTFT of the previous batch may still be
+        # reading one of them.
+        _ort = self.onnx_model
+        batch_size = len(spek)
+        run_size = batch_size*2 if self.is_denoise else batch_size
+        input_buffer, output_buffers = self.get_io_buffers(run_size)
+        spek_input = input_buffer[:run_size]
+        spec_pred = output_buffers[buffer_index][:run_size]
+
+        if self.is_denoise:
+            # Both polarities go through the session as a single batch.
+            torch.neg(spek, out=spek_input[:batch_size])
+            spek_input[batch_size:].copy_(spek)
+        else:
+            spek_input.copy_(spek)
+
+        io_binding = _ort.io_binding()
+        io_binding.bind_input(_ort.get_inputs()[0].name, 'cpu', 0, np.float32, list(spek_input.shape), spek_input.data_ptr())
+        io_binding.bind_output(_ort.get_outputs()[0].name, 'cpu', 0, np.float32, list(spec_pred.shape), spec_pred.data_ptr())
+        _ort.run_with_iobinding(io_binding)
+
+        if self.is_denoise:
+            spec_pred = -spec_pred[:batch_size]*0.5+spec_pred[batch_size:]*0.5
+
+        return spec_pred
+
+    def get_io_buffers(self, run_size):
+        if self.io_buffers is None or len(self.io_buffers[0]) < run_size:
+            shape = [run_size, self.dim_c, self.dim_f, self.dim_t]
+            self.io_buffers = torch.empty(shape), [torch.empty(shape), torch.empty(shape)]
+
+        return self.io_buffers
+
     def stft(self, x):
         x = x.reshape([-1, self.chunk_size])
         x = torch.stft(x, n_fft=self.n_fft, hop_length=self.hop, window=self.window, center=True)
@@ -391,13 +792,30 @@ class SeperateDemucs(SeperateAttributes):
                 self.demucs.load_state_dict(torch.load(self.model_path))
                 self.demucs.eval()
             else:  
-                self.demucs = HDemucs(sources=self.demucs_source_list)
-                self.demucs = _gm(name=os.path.splitext(os.path.basename(self.model_path))[0], 
-                                  repo=Path(os.path.dirname(self.model_path)))
+                self.demucs = demucs_model_pool.get_model(self.model_path)
                 self.demucs = demucs_segments(self.segment, self.demucs)
                 self.demucs.to(self.device)
                 self.demucs.eval()
 
+                if self.segment == AUTO_SELECT:
+                    self.autotune_segment()
+
+                self.load_demucs_backend()
+                self.tune_attention_backend()
+
+                if self.segment_batch == AUTO_SELECT:
+                    self.autotune_segment_batch()
+
+                self.tune_cpu_workers()
+
+            if self.chunks_demucs == AUTO_SELECT:
+                shifts, self.shifts = self.shifts, 0
+                self.chunks_demucs = self.autotune_chunks(f'chunks_demucs_{self.segment}_{self.overlap}', self.demix_demucs, (10, 20), self.device)
+                self.shifts = shifts
+
+            if isinstance(self.demucs, BagOfModels):
+                self.model_times = [0] * len(self.demucs.models)
+
             if self.pre_proc_model:
                 if self.primary_stem not in [VOCAL_STEM, INST_STEM]:
                     is_no_write = True
@@ -418,6 +836,18 @@ class SeperateDemucs(SeperateAttributes):
                 source = self.demix_demucs(mix)
             
             self.write_to_console(DONE, base_text='')
+
+            if self.attention_times:
+                self.write_to_console(ATTENTION_BACKEND_TIMES(self.demucs_attention, self.attention_times))
+
+            if self.cpu_workers_speedup:
+                self.write_to_console(CPU_WORKERS_SPEEDUP(self.demucs_cpu_workers, max(self.demucs_cpu_threads // (self.get_model_workers()*self.demucs_cpu_workers), 1), self.cpu_workers_speedup))
+
+            if self.model_times:
+                self.write_to_console(BAG_MODEL_TIMES(self.model_times))
+
+            if self.demucs_version not in (DEMUCS_V1, DEMUCS_V2):
+                demucs_model_pool.release(self.demucs)
             
             del self.demucs
 
@@ -530,6 +960,129 @@ class SeperateDemucs(SeperateAttributes):
             if self.is_secondary_model:    
                 return secondary_sources
     
+    def autotune_segment(self):
+        models = get_sub_models(self.demucs)
+        default_segment = min(float(model.segment) for model in models)
+        candidates = [int(segment) for segment in DEMUCS_SEGMENTS if segment.isdigit()]
+
+        # Transformer models cannot run on segments longer than they were trained on.
+        if any(isinstance(model, HTDemucs) for model in models):
+            candidates = [segment for segment in candidates if segment < default_segment] + [default_segment]
+            probe_sizes = (default_segment/2, default_segment)
+        else:
+            probe_sizes = (5, 10)
+
+        def set_segment(segment):
+            for model in models:
+                model.segment = segment
+
+        def probe(segment):
+            set_segment(segment)
+            mix = torch.zeros(1, 2, int(44100*segment))
+            with torch.no_grad():
+                apply_model(self.demucs, mix, 0, True, self.overlap, device=self.device)
+
+        segment = self.autotune(f'segment_{self.overlap}', probe, probe_sizes, candidates, self.device, is_largest=True)
+        set_segment(segment)
+        self.segment = str(segment)
+
+    def autotune_segment_batch(self):
+        if not self.is_split_mode:
+            self.segment_batch = 1
+            return
+
+        models = get_sub_models(self.demucs)
+        segment = max(int(44100*float(model.segment)) for model in models)
+
+        # Without overlap a mix of `batch` segments is exactly one batch.
+        def probe(batch):
+            mix = torch.zeros(1, 2, segment*batch)
+            with torch.no_grad():
+                apply_model(self.demucs, mix, 0, True, 0, device=self.device, segment_batch_size=batch)
+
+        self.segment_batch = self.autotune(f'segment_batch_{self.segment}', probe, (1, 4), AUTOTUNE_SEGMENT_BATCHES, self.device)
+
+    def load_demucs_backend(self):
+        """Runs the models from their exports with the ONNX Runtime and TorchScript backends, when exported for the current segment"""
+
+        export_format = DEMUCS_BACKENDS.get(self.demucs_backend)
+
+        if not attach_exported_cores(self.demucs, self.model_path, export_format, self.device) and export_format:
+            self.write_to_console(DEMUCS_EXPORT_MISSING(self.demucs_backend))
+            self.demucs_backend = DEMUCS_BACKEND_PYTORCH
+
+    def tune_attention_backend(self):
+        """Sets the attention backend of the transformer layers, with "Auto" the fastest usable one on a single segment"""
+
+        if self.demucs_backend != DEMUCS_BACKEND_PYTORCH or not any(isinstance(module, CrossTransformerEncoder) for module in self.demucs.modules()):
+            return
+
+        if self.demucs_attention != AUTO_SELECT:
+            set_attention_backend(self.demucs, DEMUCS_ATTENTION_BACKENDS.get(self.demucs_attention, 'native'))
+            return
+
+        backends = get_attention_backends(self.demucs)
+        candidates = [name for name, backend in DEMUCS_ATTENTION_BACKENDS.items() if backend in backends]
+
+        if len(candidates) < 2:
+            self.demucs_attention = candidates[0] if candidates else DEMUCS_ATTENTION_NATIVE
+            set_attention_backend(self.demucs, DEMUCS_ATTENTION_BACKENDS[self.demucs_attention])
+            return
+
+        models = get_sub_models(self.demucs)
+        segment = max(int(44100*float(model.segment)) for model in models)
+
+        def probe(backend):
+            set_attention_backend(self.demucs, DEMUCS_ATTENTION_BACKENDS[backend])
+            mix = torch.zeros(1, 2, segment)
+            with torch.no_grad():
+                apply_model(self.demucs, mix, 0, True, 0, device=self.device)
+
+        self.attention_times = self.autotuner.compare(f'attention_{self.segment}', probe, candidates, self.device)
+        self.demucs_attention = min(self.attention_times, key=self.attention_times.get)
+        set_attention_backend(self.demucs, DEMUCS_ATTENTION_BACKENDS[self.demucs_attention])
+
+    def get_model_workers(self):
+        """Number of bag sub-models run side by side on CPU, set by the Concurrent Models option"""
+
+        return len(self.demucs.models) if self.is_demucs_concurrent_models and self.device.type == 'cpu' and isinstance(self.demucs, BagOfModels) else 1
+
+    def tune_cpu_workers(self):
+        """Picks the number of parallel segment workers for CPU conversions and times it against a single worker"""
+
+        self.demucs_cpu_threads = torch.get_num_threads() if self.demucs_cpu_threads == AUTO_SELECT else int(self.demucs_cpu_threads)
+
+        if self.device.type != 'cpu' or not self.is_split_mode:
+            self.demucs_cpu_workers = 1
+            return
+
+        model_workers = self.get_model_workers()
+        model_threads = max(self.demucs_cpu_threads // model_workers, 1)
+
+        if self.demucs_cpu_workers == AUTO_SELECT:
+            candidates = [workers for workers in AUTOTUNE_CPU_WORKERS if workers <= max(model_threads // 2, 1)]
+        else:
+            candidates = sorted({1, min(int(self.demucs_cpu_workers), model_threads)})
+
+        if len(candidates) == 1:
+            self.demucs_cpu_workers = candidates[0]
+            return
+
+        models = get_sub_models(self.demucs)
+        segment = max(int(44100*float(model.segment)) for model in models)
+        segment_batch = int(self.segment_batch)
+
+        # Without overlap every worker count gets whole rounds of segment batches. The pools are nested as in demix_demucs.
+        def probe(workers):
+            mix = torch.zeros(1, 2, segment*segment_batch*max(candidates))
+            with cpu_pool(model_workers, self.demucs_cpu_threads) as model_pool, \
+                 cpu_pool(model_workers*workers, self.demucs_cpu_threads) as pool, torch.no_grad():
+                apply_model(self.demucs, mix, 0, True, 0, device=self.device, pool=pool, segment_batch_size=segment_batch, model_pool=model_pool)
+
+        times = self.autotuner.compare(f'cpu_workers_{self.demucs_cpu_threads}_{model_workers}_{self.segment}_{segment_batch}', probe, candidates, self.device)
+        self.demucs_cpu_workers = min(candidates, key=times.get) if self.demucs_cpu_workers == AUTO_SELECT else candidates[-1]
+        self.cpu_workers_speedup = times[1] / times[self.demucs_cpu_workers] if self.demucs_cpu_workers > 1 else None
+
     def demix_demucs(self, mix):
         processed = {}
 
@@ -557,16 +1110,27 @@ class SeperateDemucs(SeperateAttributes):
                                                 self.shifts,
                                                 self.is_split_mode,
                                                 self.overlap,
-                                                set_progress_bar=set_progress_bar)
+                                                set_progress_bar=set_progress_bar,
+                                                batch_shifts=self.is_demucs_batch_shifts)
                 else:
-                    sources = apply_model(self.demucs, 
-                                            mix_infer[None], 
-                                            self.shifts,
-                                            self.is_split_mode,
-                                            self.overlap,
-                                            static_shifts=1 if self.shifts == 0 else self.shifts,
-                                            set_progress_bar=set_progress_bar,
-                                            device=self.device)[0]
+                    model_workers = self.get_model_workers()
+
+                    # The model workers only queue their segments, so the segment pool holds the workers of every model.
+                    with cpu_pool(model_workers, self.demucs_cpu_threads) as model_pool, \
+                         cpu_pool(model_workers*self.demucs_cpu_workers, self.demucs_cpu_threads) as pool:
+                        sources = apply_model(self.demucs, 
+                                                mix_infer[None], 
+                                                self.shifts,
+                                                self.is_split_mode,
+                                                self.overlap,
+                                                static_shifts=1 if self.shifts == 0 else self.shifts,
+                                                set_progress_bar=set_progress_bar,
+                                                device=self.device,
+                                                pool=pool,
+                                                segment_batch_size=int(self.segment_batch),
+                                                batch_shifts=self.is_demucs_batch_shifts,
+                                                model_pool=model_pool,
+                                                model_times=self.model_times)[0]
             
             sources = (sources * ref.std() + ref.mean()).cpu().numpy()
             sources[[0,1]] = sources[[1,0]]
@@ -613,8 +1177,17 @@ class SeperateVR(SeperateAttributes):
 
             model.load_state_dict(torch.load(self.model_path, map_location=device)) 
             model.to(device) 
+
+            if self.batch_size == AUTO_SELECT:
+                self.batch_size = self.autotune_batch_size(model, device, is_new_arch=inference == self.inference_vr_new)
             
             self.running_inference()
+
+            if self.is_streaming_mix(self.is_vr_streaming):
+                self.seperate_streaming(device, model, inference)
+                del model
+                torch.cuda.empty_cache()
+                return
             
             y_spec, v_spec = inference(self.loading_mix(), device, model, self.aggressiveness)
             self.write_to_console(DONE, base_text='')
@@ -658,9 +1231,32 @@ class SeperateVR(SeperateAttributes):
         if self.is_secondary_model:
             return secondary_sources
             
-    def loading_mix(self):
+    def autotune_batch_size(self, model, device, is_new_arch):
+        width = self.crop_size if is_new_arch else self.window_size
+        model.eval()
+
+        def probe(batch_size):
+            X_batch = torch.zeros(batch_size, 2, self.mp.param['bins']+1, width, device=device)
+            with torch.no_grad():
+                model.predict_mask(X_batch) if is_new_arch else model.predict(X_batch, self.aggressiveness)
 
-        X_wave, X_spec_s = {}, {}
+        return self.autotune(f'batch_size_{width}', probe, (1, 4), AUTOTUNE_VR_BATCHES, device)
+
+    def loading_mix(self, mix=None):
+        """
+        Returns the combined spectrogram of the input file, or of `mix` (a 44100 Hz block) if given.
+
+        Each band is resampled from the band above it and its STFT runs in a worker thread while
+        the lower bands are resampled. When other models will run on the same file (ensembles,
+        secondary models), its band waves and spectrograms are kept in vr_band_cache under the
+        band definitions they depend on, so models that share them prepare each band once.
+        """
+
+        X_wave, X_spec_s, spec_futures = {}, {}, {}
+        wave_keys, spec_keys = {}, {}
+        is_shared_file = self.is_ensemble_mode or self.is_secondary_model or self.is_secondary_model_activated
+        file_key = get_file_key(self.audio_file) if mix is None and is_shared_file else None
+        resample_chain = ()
         
         bands_n = len(self.mp.param['band'])
         
@@ -671,24 +1267,52 @@ class SeperateVR(SeperateAttributes):
                 wav_resolution = 'polyphase' if SYSTEM_PROC == ARM or ARM in SYSTEM_ARCH else bp['res_type']
             else:
                 wav_resolution = bp['res_type']
-        
-            if d == bands_n: # high-end band
-                X_wave[d], _ = librosa.load(self.audio_file, bp['sr'], False, dtype=np.float32, res_type=wav_resolution)
-                    
-                if not np.any(X_wave[d]) and self.audio_file.endswith('.mp3'):
-                    X_wave[d] = rerun_mp3(self.audio_file, bp['sr'])
 
-                if X_wave[d].ndim == 1:
-                    X_wave[d] = np.asarray([X_wave[d], X_wave[d]])
-            else: # lower bands
-                X_wave[d] = librosa.resample(X_wave[d+1], self.mp.param['band'][d+1]['sr'], bp['sr'], res_type=wav_resolution)
-                
-            X_spec_s[d] = spec_utils.wave_to_spectrogram_mt(X_wave[d], bp['hl'], bp['n_fft'], self.mp.param['mid_side'], 
-                                                            self.mp.param['mid_side_b2'], self.mp.param['reverse'])
+            # A band wave depends on the sample rates and resampling types of all the bands above it.
+            resample_chain += ((bp['sr'], wav_resolution),)
+            wave_keys[d] = (file_key, resample_chain)
+            spec_keys[d] = (file_key, resample_chain, bp['hl'], bp['n_fft'], self.mp.param['mid_side'], self.mp.param['mid_side_b2'], self.mp.param['reverse'])
+            X_spec_s[d] = vr_band_cache.get(spec_keys[d]) if file_key else None
+
+        missing_bands = [d for d, spec in X_spec_s.items() if spec is None]
+
+        with ThreadPoolExecutor(max_workers=max(len(missing_bands), 1)) as pool:
+            for d in range(bands_n, min(missing_bands, default=bands_n+1)-1, -1):
+                bp = self.mp.param['band'][d]
+                wav_resolution = wave_keys[d][1][-1][1]
+                X_wave[d] = vr_band_cache.get(wave_keys[d]) if file_key else None
             
-            if d == bands_n and self.high_end_process != 'none':
-                self.input_high_end_h = (bp['n_fft']//2 - bp['crop_stop']) + (self.mp.param['pre_filter_stop'] - self.mp.param['pre_filter_start'])
-                self.input_high_end = X_spec_s[d][:, bp['n_fft']//2-self.input_high_end_h:bp['n_fft']//2, :]
+                if X_wave[d] is None:
+                    if d == bands_n and mix is not None:
+                        X_wave[d] = mix if bp['sr'] == 44100 else librosa.resample(mix, orig_sr=44100, target_sr=bp['sr'], res_type=wav_resolution)
+                    elif d == bands_n: # high-end band
+                        X_wave[d], _ = librosa.load(self.audio_file, bp['sr'], False, dtype=np.float32, res_type=wav_resolution)
+                            
+                        if not np.any(X_wave[d]) and self.audio_file.endswith('.mp3'):
+                            X_wave[d] = rerun_mp3(self.audio_file, bp['sr'])
+
+                        if X_wave[d].ndim == 1:
+                            X_wave[d] = np.asarray([X_wave[d], X_wave[d]])
+                    else: # lower bands
+                        X_wave[d] = librosa.resample(X_wave[d+1], self.mp.param['band'][d+1]['sr'], bp['sr'], res_type=wav_resolution)
+
+                    if file_key:
+                        vr_band_cache.put(wave_keys[d], X_wave[d])
+
+                if X_spec_s[d] is None:
+                    spec_futures[d] = pool.submit(spec_utils.wave_to_spectrogram_mt, X_wave[d], bp['hl'], bp['n_fft'], self.mp.param['mid_side'], 
+                                                  self.mp.param['mid_side_b2'], self.mp.param['reverse'])
+
+            for d, spec_future in spec_futures.items():
+                X_spec_s[d] = spec_future.result()
+                if file_key:
+                    vr_band_cache.put(spec_keys[d], X_spec_s[d])
+
+        bp = self.mp.param['band'][bands_n]
+
+        if self.high_end_process != 'none':
+            self.input_high_end_h = (bp['n_fft']//2 - bp['crop_stop']) + (self.mp.param['pre_filter_stop'] - self.mp.param['pre_filter_start'])
+            self.input_high_end = X_spec_s[bands_n][:, bp['n_fft']//2-self.input_high_end_h:bp['n_fft']//2, :]
 
         X_spec = spec_utils.combine_spectrograms(X_spec_s, self.mp)
         
@@ -696,46 +1320,22 @@ class SeperateVR(SeperateAttributes):
 
         return X_spec
 
-    def inference_vr(self, X_spec, device, model, aggressiveness):
-        
-        def _execute(X_mag_pad, roi_size, n_window, device, model, aggressiveness):
-            model.eval()
-            
-            total_iterations = sum([n_window]) if not self.is_tta else sum([n_window])*2
-            
-            with torch.no_grad():
-                preds = []
-
-                for i in range(n_window):
-                    self.progress_value +=1
-                    self.set_progress_bar(0.1, 0.8/total_iterations*self.progress_value)
-                    start = i * roi_size
-                    X_mag_window = X_mag_pad[None, :, :, start:start + self.window_size]
-                    X_mag_window = torch.from_numpy(X_mag_window).to(device)
-                    pred = model.predict(X_mag_window, aggressiveness)
-                    pred = pred.detach().cpu().numpy()
-                    preds.append(pred[0])
-                    
-                pred = np.concatenate(preds, axis=2)
-            return pred
-
+    def inference_vr(self, X_spec, device, model, aggressiveness, mag_peak=None):
+        model.eval()
         X_mag, X_phase = spec_utils.preprocess(X_spec)
-        coef = X_mag.max()
+        coef = mag_peak or X_mag.max()
         X_mag_pre = X_mag / coef
         n_frame = X_mag_pre.shape[2]
         pad_l, pad_r, roi_size = spec_utils.make_padding(n_frame, self.window_size, model.offset)
         n_window = int(np.ceil(n_frame / roi_size))
-        X_mag_pad = np.pad(
-            X_mag_pre, ((0, 0), (0, 0), (pad_l, pad_r)), mode='constant')
-        pred = _execute(X_mag_pad, roi_size, n_window, device, model, aggressiveness)
+        shift = roi_size // 2 if self.is_tta else 0
+        X_mag_pad = np.pad(X_mag_pre, ((0, 0), (0, 0), (pad_l + shift, pad_r + shift)), mode='constant')
+        windows = [shift + i * roi_size for i in range(n_window)]
+        windows_tta = [i * roi_size for i in range(n_window + 1)] if self.is_tta else []
+        pred, pred_tta = self.execute_windows(X_mag_pad, windows, windows_tta, self.window_size, device, lambda X_batch:model.predict(X_batch, aggressiveness))
         pred = pred[:, :, :n_frame]
         
         if self.is_tta:
-            pad_l += roi_size // 2
-            pad_r += roi_size // 2
-            n_window += 1
-            X_mag_pad = np.pad(X_mag_pre, ((0, 0), (0, 0), (pad_l, pad_r)), mode='constant')
-            pred_tta = _execute(X_mag_pad, roi_size, n_window, device, model, aggressiveness)
             pred_tta = pred_tta[:, :, roi_size // 2:]
             pred_tta = pred_tta[:, :, :n_frame]
             pred, X_mag, X_phase = (pred + pred_tta) * 0.5 * coef, X_mag, np.exp(1.j * X_phase)
@@ -751,40 +1351,7 @@ class SeperateVR(SeperateAttributes):
         
         return y_spec, v_spec
 
-    def inference_vr_new(self, X_spec, device, model, aggressiveness):
-        
-        def _execute(X_mag_pad, roi_size):
-            
-            X_dataset = []
-            patches = (X_mag_pad.shape[2] - 2 * model.offset) // roi_size
-            total_iterations = patches//self.batch_size if not self.is_tta else (patches//self.batch_size)*2
-            
-            for i in range(patches):
-                start = i * roi_size
-                X_mag_crop = X_mag_pad[:, :, start:start + self.crop_size]
-                X_dataset.append(X_mag_crop)
-
-            X_dataset = np.asarray(X_dataset)
-            model.eval()
-            
-            with torch.no_grad():
-                mask = []
-                # To reduce the overhead, dataloader is not used.
-                for i in range(0, patches, self.batch_size):
-                    self.progress_value += 1
-                    if self.progress_value >= total_iterations:
-                        self.progress_value = total_iterations
-                    self.set_progress_bar(0.1, 0.8/total_iterations*self.progress_value)
-                    X_batch = X_dataset[i: i + self.batch_size]
-                    X_batch = torch.from_numpy(X_batch).to(device)
-                    pred = model.predict_mask(X_batch)
-                    pred = pred.detach().cpu().numpy()
-                    pred = np.concatenate(pred, axis=2)
-                    mask.append(pred)
-                    
-                mask = np.concatenate(mask, axis=2)
-
-            return mask
+    def inference_vr_new(self, X_spec, device, model, aggressiveness, mag_peak=None):
         
         def postprocess(mask, X_mag, X_phase, aggressiveness):
             
@@ -801,19 +1368,20 @@ class SeperateVR(SeperateAttributes):
         
             return y_spec, v_spec
         
+        model.eval()
         X_mag, X_phase = spec_utils.preprocess(X_spec)
         n_frame = X_mag.shape[2]
         pad_l, pad_r, roi_size = spec_utils.make_padding(n_frame, self.crop_size, model.offset)
-        X_mag_pad = np.pad(X_mag, ((0, 0), (0, 0), (pad_l, pad_r)), mode='constant')
-        X_mag_pad /= X_mag_pad.max()
-        mask = _execute(X_mag_pad, roi_size)
+        shift = roi_size // 2 if self.is_tta else 0
+        X_mag_pad = np.pad(X_mag, ((0, 0), (0, 0), (pad_l + shift, pad_r + shift)), mode='constant')
+        X_mag_pad /= mag_peak or X_mag_pad.max()
+        patches = (n_frame + pad_l + pad_r - 2 * model.offset) // roi_size
+        patches_tta = (X_mag_pad.shape[2] - 2 * model.offset) // roi_size
+        windows = [shift + i * roi_size for i in range(patches)]
+        windows_tta = [i * roi_size for i in range(patches_tta)] if self.is_tta else []
+        mask, mask_tta = self.execute_windows(X_mag_pad, windows, windows_tta, self.crop_size, device, model.predict_mask)
         
         if self.is_tta:
-            pad_l += roi_size // 2
-            pad_r += roi_size // 2
-            X_mag_pad = np.pad(X_mag, ((0, 0), (0, 0), (pad_l, pad_r)), mode='constant')
-            X_mag_pad /= X_mag_pad.max()
-            mask_tta = _execute(X_mag_pad, roi_size)
             mask_tta = mask_tta[:, :, roi_size // 2:]
             mask = (mask[:, :, :n_frame] + mask_tta[:, :, :n_frame]) * 0.5
         else:
@@ -823,6 +1391,115 @@ class SeperateVR(SeperateAttributes):
         
         return y_spec, v_spec
 
+    def execute_windows(self, X_mag_pad, windows, windows_tta, window_size, device, predict):
+        """
+        Runs `predict` on batches of the `window_size` slices of `X_mag_pad` that start at
+        `windows` and, with TTA, `windows_tta`. Both sets slice the same padded spectrogram
+        and are interleaved in the same batches, so TTA only adds batches instead of a
+        second pass. Returns the predictions of each set joined along time (None for an
+        empty set).
+        
+        The overlapping windows are never materialized together, each batch is gathered
+        into one reused buffer (pinned when the model runs on CUDA).
+        """
+        
+        # To reduce the overhead, dataloader is not used.
+        jobs = sorted([(start, 0) for start in windows] + [(start, 1) for start in windows_tta])
+        total_iterations = int(np.ceil(len(jobs) / self.batch_size))
+        preds = ([], [])
+        is_cuda = torch.device(device).type == 'cuda'
+        X_buffer = torch.empty((min(self.batch_size, len(jobs)), *X_mag_pad.shape[:2], window_size), dtype=torch.float32, pin_memory=is_cuda)
+        X_buffer_np = X_buffer.numpy()
+        
+        with torch.no_grad():
+            for i in range(0, len(jobs), self.batch_size):
+                batch = jobs[i:i + self.batch_size]
+                self.progress_value = min(self.progress_value + 1, total_iterations)
+                self.set_progress_bar(0.1, 0.8/total_iterations*self.progress_value)
+                for j, (start, _) in enumerate(batch):
+                    X_buffer_np[j] = X_mag_pad[:, :, start:start + window_size]
+                X_batch = X_buffer[:len(batch)].to(device, non_blocking=is_cuda)
+                pred = predict(X_batch).detach().cpu().numpy()
+                
+                for (_, index), window_pred in zip(batch, pred):
+                    preds[index].append(window_pred)
+
+        return [np.concatenate(pred, axis=2) if pred else None for pred in preds]
+
+    def seperate_streaming(self, device, model, inference):
+        """
+        Runs the whole VR pipeline (band STFTs, inference, masking and multi-band iSTFT) on
+        overlapping blocks of the input and appends both stems to open soundfile writers, so
+        memory use depends on VR_STREAM_CHUNKS instead of the track length. Neighbouring
+        blocks are crossfaded over VR_STREAM_CROSSFADE samples inside their margins.
+        """
+
+        peaks, tails = {}, {}
+        fade = VR_STREAM_CROSSFADE//2
+        set_progress_bar = self.set_progress_bar
+        stem_paths, write_paths, writers = self.open_stream_writers()
+
+        # Blocks start on a frame of every band and on a window of the model, so their STFT
+        # frames and model windows line up with the ones of the whole track.
+        window_size = self.crop_size if inference == self.inference_vr_new else self.window_size
+        roi_size = window_size - model.offset*2 or window_size
+        bp = self.mp.param['band'][len(self.mp.param['band'])]
+        align = math.lcm(*[(b['hl']*44100)//math.gcd(b['hl']*44100, b['sr']) for b in self.mp.param['band'].values()])
+        align_frames = align*bp['sr']//(bp['hl']*44100)
+        align *= roi_size//math.gcd(align_frames, roi_size)
+        chunk_size = max(VR_STREAM_CHUNKS*44100//align, 1)*align
+        margin = max(-(-VR_STREAM_MARGIN//align)*align, fade)
+
+        def read_block(audio, start, end):
+            audio.seek(start)
+            mix = audio.read(end-start, dtype='float32', always_2d=True).T
+            return np.asfortranarray([mix[0], mix[0]]) if mix.shape[0] == 1 else np.asfortranarray(mix)
+
+        def block_to_wav(spec, length):
+            wav = self.spec_to_wav(spec)
+            if not self.model_samplerate == 44100:
+                wav = librosa.resample(wav, orig_sr=self.model_samplerate, target_sr=44100)
+            return np.pad(wav[:, :length], ((0, 0), (0, max(length-wav.shape[1], 0))))
+
+        try:
+            with sf.SoundFile(self.audio_file) as audio:
+                block_bounds = [(skip, max(skip-margin, 0), min(skip+chunk_size+margin, audio.frames)) for skip in range(0, audio.frames, chunk_size)]
+
+                # The model input is scaled by the magnitude peak of the whole track, as in the in-memory path.
+                mag_peak = max((np.abs(self.loading_mix(read_block(audio, start, end))).max() for _, start, end in block_bounds), default=0)
+
+                # The inference reports its progress per block, the bar follows the blocks instead.
+                self.set_progress_bar = lambda *args, **kwargs:None
+
+                for i, (skip, start, end) in enumerate(block_bounds):
+                    set_progress_bar(0.1, (0.8/len(block_bounds)*(i+1)))
+                    is_last = i == len(block_bounds) - 1
+                    cut = end if is_last else block_bounds[i+1][0]
+                    y_spec, v_spec = inference(self.loading_mix(read_block(audio, start, end)), device, model, self.aggressiveness, mag_peak=mag_peak)
+                    specs = {self.primary_stem: y_spec, self.secondary_stem: v_spec}
+
+                    for stem, writer in writers.items():
+                        wav = block_to_wav(specs[stem], end-start)
+                        source = wav[:, (0 if i == 0 else skip-fade)-start:(cut if is_last else cut-fade)-start]
+
+                        if stem in tails:
+                            tail = tails.pop(stem)
+                            ramp = (np.arange(tail.shape[1]) + 0.5) / tail.shape[1]
+                            source[:, :tail.shape[1]] = tail*(1-ramp) + source[:, :tail.shape[1]]*ramp
+
+                        if not is_last:
+                            tails[stem] = wav[:, cut-fade-start:min(cut+fade, end)-start]
+
+                        peaks[stem] = max(peaks.get(stem, 0), np.abs(source).max(initial=0))
+                        writer.write(source.T)
+        finally:
+            self.set_progress_bar = set_progress_bar
+            for writer in writers.values():
+                writer.close()
+
+        self.write_to_console(DONE, base_text='')
+        self.save_streamed_stems(stem_paths, write_paths, peaks, chunk_size)
+
     def spec_to_wav(self, spec):
         
         if self.high_end_process.startswith('mirroring'):        
@@ -884,25 +1561,9 @@ def prepare_mix(mix, chunk_set, margin_set, mdx_net_cut=False, is_missing_mix=Fa
 
     def get_segmented_mix(chunk_set=chunk_set):
         segmented_mix = {}
-        
-        samples = mix.shape[-1]
-        margin = margin_set
-        chunk_size = chunk_set*44100
-        assert not margin == 0, 'margin cannot be zero!'
-        if margin > chunk_size:
-            margin = chunk_size
-        if chunk_set == 0 or samples < chunk_size:
-            chunk_size = samples
-        
-        counter = -1
-        for skip in range(0, samples, chunk_size):
-            counter+=1
-            s_margin = 0 if counter == 0 else margin
-            end = min(skip+chunk_size+margin, samples)
-            start = skip-s_margin
-            segmented_mix[skip] = mix[:,start:end].copy()
-            if end == samples:
-                break
+
+        for skip, start, end in get_chunk_bounds(mix.shape[-1], chunk_set, margin_set):
+            segmented_mix[skip] = mix[:,start:end]
             
         return segmented_mix
 
@@ -913,6 +1574,38 @@ def prepare_mix(mix, chunk_set, margin_set, mdx_net_cut=False, is_missing_mix=Fa
         raw_mix = get_segmented_mix(chunk_set=0) if mdx_net_cut else mix
         return segmented_mix, raw_mix, samplerate
 
+def get_chunk_bounds(samples, chunk_set, margin_set):
+    """Returns (skip, start, end) sample positions of each chunk, start and end include the margins"""
+
+    chunk_bounds = []
+    margin = margin_set
+    chunk_size = chunk_set*44100
+    assert not margin == 0, 'margin cannot be zero!'
+    if margin > chunk_size:
+        margin = chunk_size
+    if chunk_set == 0 or samples < chunk_size:
+        chunk_size = samples
+
+    counter = -1
+    for skip in range(0, samples, chunk_size):
+        counter+=1
+        s_margin = 0 if counter == 0 else margin
+        end = min(skip+chunk_size+margin, samples)
+        start = skip-s_margin
+        chunk_bounds.append((skip, start, end))
+        if end == samples:
+            break
+
+    return chunk_bounds
+
+def frame_mix(mix, frame_size, hop_size):
+    """Returns overlapping frames of a (channels, samples) mix as a
+    (frames, channels, frame_size) float32 view, without copying the data."""
+
+    mix = torch.as_tensor(mix, dtype=torch.float32)
+
+    return mix.unfold(-1, frame_size, hop_size).transpose(0, 1)
+
 def rerun_mp3(audio_file, sample_rate=44100):
 
     with audioread.audio_open(audio_file) as f:
@@ -920,6 +1613,13 @@ def rerun_mp3(audio_file, sample_rate=44100):
 
     return librosa.load(audio_file, duration=track_length, mono=False, sr=sample_rate)[0]
 
+def get_duration(audio_file):
+    try:
+        duration = audio_file.shape[-1]/44100 if isinstance(audio_file, np.ndarray) else librosa.get_duration(filename=audio_file)
+        return math.ceil(duration)
+    except Exception:
+        return None
+
 def save_format(audio_path, save_format, mp3_bit_set):
     
     if not save_format == WAV: